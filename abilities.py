@@ -0,0 +1,57 @@
+# abilities.py
+#
+# Resolves a unit's spell_*/skill_* tags against spells.json and skills.json
+# once, instead of re-scanning tags and re-looking up costs every turn.
+from collections import namedtuple
+from functools import lru_cache
+
+import mage_rules
+import warrior_rules
+from resistances import channel_index
+
+# channel_index is the channel's position in resistances tables
+Ability = namedtuple('Ability', 'kind name cost cooldown effect magnitude channel stat modifier duration channel_index')
+
+@lru_cache(maxsize=None)
+def compile_tags(tags):
+    """Compiles a tuple of unit tags into (abilities, unknown).
+
+    abilities lists spells (only for units tagged can_cast) and then skills,
+    each in tag order, which is the order action selection tries them.
+    unknown lists the spell_/skill_ tags that name nothing in the data files.
+    """
+    spells = []
+    skills = []
+    unknown = []
+    can_cast = "can_cast" in tags
+    for tag in tags:
+        if tag.startswith("spell_"):
+            spell = mage_rules.SPELL_DATA.get(tag[6:])
+            if spell is None:
+                unknown.append(tag)
+            elif can_cast:
+                spells.append(Ability(
+                    "spell", tag[6:], spell["cost"], spell.get("cooldown", 0), spell.get("effect"),
+                    tuple(spell.get("magnitude", (0, 0))), spell.get("channel", "generic"),
+                    None, 0, 0, channel_index(spell.get("channel", "generic")),
+                ))
+        elif tag.startswith("skill_"):
+            skill = warrior_rules.SKILL_DATA.get(tag[6:])
+            if skill is None or skill.get("cost") is None:
+                unknown.append(tag)
+            else:
+                skills.append(Ability(
+                    "skill", tag[6:], skill["cost"], skill.get("cooldown", 0), skill.get("effect"),
+                    tuple(skill.get("magnitude", (0, 0))), "generic",
+                    skill.get("stat"), skill.get("modifier", 0), skill.get("duration", 0),
+                    channel_index("generic"),
+                ))
+    return tuple(spells + skills), tuple(unknown)
+
+def compile_abilities(unit):
+    """The unit's usable abilities as a tuple of Ability records."""
+    return compile_tags(tuple(unit.get('tags', ())))[0]
+
+def unknown_abilities(unit):
+    """spell_/skill_ tags on the unit that have no entry in spells.json/skills.json."""
+    return compile_tags(tuple(unit.get('tags', ())))[1]
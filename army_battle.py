@@ -0,0 +1,168 @@
+# army_battle.py
+#
+# Fights two armies saved by the army drafter (drafted_armies/*.json) against
+# each other. Every unit is a Combatant and uses the same combat_core rules as
+# a duel. Each side keeps a min-heap of enemy units keyed on current HP, so
+# picking the weakest target is O(log n) instead of a scan of the whole
+# opposing roster.
+import argparse
+import heapq
+import json
+import os
+import random
+from collections import Counter
+
+from combat_core import resolve_action, apply_regen, process_effects, tick_cooldowns
+from combat_events import NULL
+from combat_loop import MAX_ROUNDS
+from combat_state import Combatant
+from rng_streams import battle_rng, new_master_seed
+from unit_registry import REGISTRY
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DRAFTED_ARMIES_DIR = os.path.join(SCRIPT_DIR, "drafted_armies")
+
+def load_army(army_name, multiplier=1):
+    """Loads a saved army and expands its unit counts into Combatants.
+
+    multiplier scales every count, which is handy for stress-testing with
+    large armies. Returns (army display name, [Combatant, ...]).
+    """
+    path = os.path.join(DRAFTED_ARMIES_DIR, f"{army_name}.json")
+    with open(path, 'r') as f:
+        saved = json.load(f)
+    combatants = []
+    for unit_name, quantity in saved.get('units', {}).items():
+        unit = REGISTRY.get(unit_name)
+        if unit is None:
+            continue
+        for _ in range(quantity * multiplier):
+            combatants.append(Combatant(unit))
+    return saved.get('name', army_name), combatants
+
+class TargetHeap:
+    """Living units of one side ordered by current HP, weakest first.
+
+    Entries go stale when a unit's HP changes; they are skipped lazily when
+    they reach the top instead of being searched for and removed.
+    """
+
+    def __init__(self, combatants):
+        self.combatants = combatants
+        self.rebuild()
+
+    def rebuild(self):
+        self.heap = [(c.hp_current, i) for i, c in enumerate(self.combatants) if c.hp_current > 0]
+        heapq.heapify(self.heap)
+
+    def weakest(self):
+        heap = self.heap
+        while heap:
+            hp, index = heap[0]
+            if self.combatants[index].hp_current == hp:
+                return index
+            heapq.heappop(heap)
+        return None
+
+    def update(self, index):
+        """Records a change to a unit's HP; dead units simply drop out."""
+        hp = self.combatants[index].hp_current
+        if hp > 0:
+            heapq.heappush(self.heap, (hp, index))
+
+def take_turns(attackers, defenders, targets, sink, rng):
+    """Every living attacker acts once against the weakest living defender.
+
+    Returns the number of defenders killed.
+    """
+    kills = 0
+    for actor in attackers:
+        if actor.hp_current <= 0:
+            continue
+        index = targets.weakest()
+        if index is None:
+            break
+        target = defenders[index]
+        resolve_action(actor, target, sink, rng)
+        targets.update(index)
+        if target.hp_current <= 0:
+            kills += 1
+    return kills
+
+def end_of_round(combatants, sink):
+    for combatant in combatants:
+        if combatant.hp_current <= 0:
+            continue
+        process_effects(combatant, sink)
+        combatant.refresh_stats()
+        apply_regen(combatant)
+        tick_cooldowns(combatant)
+
+def run_army_battle(army1, army2, max_rounds=MAX_ROUNDS, sink=NULL, rng=random):
+    """Fights two lists of Combatants until one side is wiped out.
+
+    Army 1 acts first each round. Returns the winning side (1, 2 or None
+    for a draw once round max_rounds ends, as in combat_loop.run_battle),
+    the round the battle ended on, and survivors per unit type for each
+    side.
+    """
+    targets1 = TargetHeap(army1)   # army 2 picks targets from here
+    targets2 = TargetHeap(army2)
+    alive1 = sum(1 for c in army1 if c.hp_current > 0)
+    alive2 = sum(1 for c in army2 if c.hp_current > 0)
+    side = None
+    round_number = 1
+
+    while True:
+        alive2 -= take_turns(army1, army2, targets2, sink, rng)
+        if alive2 <= 0:
+            side = 1
+            break
+        alive1 -= take_turns(army2, army1, targets1, sink, rng)
+        if alive1 <= 0:
+            side = 2
+            break
+
+        end_of_round(army1, sink)
+        end_of_round(army2, sink)
+        # Regen moved everyone's HP, so re-key both heaps in O(n)
+        targets1.rebuild()
+        targets2.rebuild()
+        if round_number >= max_rounds:
+            break
+        round_number += 1
+
+    return {
+        'side': side,
+        'rounds': round_number,
+        'survivors1': dict(Counter(c.name for c in army1 if c.hp_current > 0)),
+        'survivors2': dict(Counter(c.name for c in army2 if c.hp_current > 0)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fight two drafted armies against each other.")
+    parser.add_argument("army1", help="saved army file name in drafted_armies/ (without .json)")
+    parser.add_argument("army2")
+    parser.add_argument("-m", "--multiplier", type=int, default=1, help="scale every unit count by this factor")
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS)
+    parser.add_argument("--seed", type=int, default=None, help="master seed; the same seed replays the same battle")
+    args = parser.parse_args()
+    seed = new_master_seed() if args.seed is None else args.seed
+
+    name1, army1 = load_army(args.army1, args.multiplier)
+    name2, army2 = load_army(args.army2, args.multiplier)
+    print(f"{name1} ({len(army1)} units) vs {name2} ({len(army2)} units), seed {seed}")
+    rng = battle_rng(seed, args.army1, args.army2, args.multiplier)
+    result = run_army_battle(army1, army2, args.max_rounds, rng=rng)
+
+    if result['side'] is None:
+        print(f"Draw after {result['rounds']} rounds.")
+    else:
+        print(f"{name1 if result['side'] == 1 else name2} wins after {result['rounds']} rounds.")
+    for name, survivors in ((name1, result['survivors1']), (name2, result['survivors2'])):
+        print(f"Survivors of {name}:")
+        for unit_name, count in sorted(survivors.items()):
+            print(f"  {count} x {unit_name}")
+
+if __name__ == "__main__":
+    main()
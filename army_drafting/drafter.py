@@ -1,9 +1,12 @@
 # army_drafting/drafter.py
 import json
 import os
+import sys
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-UNITS_DIR = os.path.join(SCRIPT_DIR, "..", "units")
+sys.path.insert(0, os.path.join(SCRIPT_DIR, ".."))  # shared modules live at the repo root
+from unit_registry import REGISTRY
+
 RULES_DIR = os.path.join(SCRIPT_DIR, "..", "army_rules")
 DRAFTED_ARMIES_DIR = os.path.join(SCRIPT_DIR, "..", "drafted_armies")
 
@@ -31,7 +34,7 @@ def save_json(filepath, data):
 
 def list_available_units():
     """Lists all available units from the units directory."""
-    units = [f.replace(".json", "") for f in os.listdir(UNITS_DIR) if f.endswith(".json")]
+    units = REGISTRY.names()
     if units:
         print("\n--- Available Units ---")
         for i, unit in enumerate(units):
@@ -43,9 +46,8 @@ def list_available_units():
         return []
 
 def get_unit_data(unit_name):
-    """Loads the data for a specific unit."""
-    filepath = os.path.join(UNITS_DIR, f"{unit_name}.json")
-    return load_json(filepath)
+    """Returns a specific unit from the shared registry (read-only)."""
+    return REGISTRY.get(unit_name)
 
 def display_unit_details(unit_data):
     """Displays the details of a unit."""
@@ -0,0 +1,305 @@
+# battle_log.py
+#
+# Compact binary traces of battle events, for keeping millions of battles
+# around for audit and analysis. BinaryLogWriter is a combat_events sink; it
+# buffers one battle's events and writes the battle when its BattleEnd
+# arrives:
+#
+#   battle header   battle id, record count, rounds, winner side, end reason
+#                   and the size of the name table
+#   name table      NUL-separated UTF-8: both unit names, then every spell,
+#                   skill, stat, channel, effect and source name the battle
+#                   used; records refer to names by position
+#   records         one fixed-width RECORD per event
+#
+# BattleStart and BattleEnd are rebuilt from the header. Actors are stored as
+# a side (0 or 1) and targets are implied, since a duel has two units. Sides
+# come from where events fall in the battle (see SideTracker), not from unit
+# names, so a unit fighting a copy of itself keeps both sides apart. The
+# file starts with a short file header; next to it, <path>.idx holds one
+# (battle id, byte offset) pair per battle so a reader can seek any battle.
+# BattleLogReader memory-maps both files, so iterating or seeking a battle
+# never loads the rest of the log.
+import argparse
+import mmap
+import os
+import struct
+
+from combat_events import (ConsoleNarrator, BattleStart, RoundStart, Turn, Attack, Cast, Skill,
+                           EffectApplied, EffectExpired, Regen, RoundEnd, BattleEnd)
+
+FILE_MAGIC = b"BLOG"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+# battle id, record count, rounds, winner side (0 for a draw), end reason, name table bytes
+BATTLE_HEADER = struct.Struct("<QIHBBH")
+# round, kind, actor side, ability/source name, flag, then six signed values
+# whose meaning depends on the kind (see encode())
+RECORD = struct.Struct("<HBBBB6h")
+INDEX_ENTRY = struct.Struct("<QQ")
+
+KINDS = ('round_start', 'turn', 'attack', 'cast', 'skill', 'effect_applied', 'effect_expired', 'regen', 'round_end')
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+END_REASONS = ('ko', 'round_cap', 'stalemate')
+NO_NAME = 0xFF
+
+class BinaryLogWriter:
+    """Appends every battle sent to it to a binary log at `path` (and its .idx index)."""
+    active = True
+
+    def __init__(self, path):
+        self.path = path
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        self.index = open(path + ".idx", 'ab')
+        if new_file:
+            self.file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, RECORD.size))
+        self.next_id = self.index.tell() // INDEX_ENTRY.size
+        self.events = []
+
+    def emit(self, event):
+        if event.kind == 'battle_end':
+            self.write_battle(self.events, event)
+            self.events = []
+        else:
+            self.events.append(event)
+
+    def write_battle(self, events, end):
+        start = events[0]
+        names = [start.unit1, start.unit2]
+        ids = {start.unit1: 0, start.unit2: 1}
+        records = []
+        round_number = 0
+        sides = SideTracker()
+        for event in events[1:]:
+            if event.kind == 'round_start':
+                round_number = event.round
+            records.append(encode(event, round_number, sides.side(event), names, ids))
+        table = "\0".join(names).encode()
+        if end.winner is None:
+            winner = 0
+        elif start.unit1 != start.unit2:
+            winner = 1 if end.winner == start.unit1 else 2
+        else:
+            # A knockout ends the battle on the winner's action
+            winner = sides.acting + 1
+        offset = self.file.tell()
+        self.file.write(BATTLE_HEADER.pack(self.next_id, len(records), end.rounds, winner,
+                                           END_REASONS.index(end.reason), len(table)))
+        self.file.write(table)
+        self.file.write(b"".join(records))
+        self.index.write(INDEX_ENTRY.pack(self.next_id, offset))
+        self.next_id += 1
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+class SideTracker:
+    """Works out which side (0 or 1) each event of a battle belongs to from the order of events.
+
+    Turn events say who is acting, and actions and applied effects belong to
+    the acting unit. Regen events come in side order at the end of every
+    round. An expired effect belongs to the side holding the oldest matching
+    effect: effects from the same source last equally long, so they expire in
+    the order they were applied.
+    """
+
+    def __init__(self):
+        self.acting = 0
+        self.regens = 0
+        self.effects = {}  # (stat, modifier, source) -> sides holding one, oldest first
+
+    def side(self, event):
+        kind = event.kind
+        if kind in ('round_start', 'round_end'):
+            self.regens = 0
+            return None
+        if kind == 'turn':
+            self.acting = 0 if event.first else 1
+        elif kind == 'regen':
+            self.regens += 1
+            return self.regens - 1
+        elif kind == 'effect_applied':
+            self.effects.setdefault((event.stat, event.modifier, event.source), []).append(self.acting)
+        elif kind == 'effect_expired':
+            return self.effects[(event.stat, event.modifier, event.source)].pop(0)
+        return self.acting
+
+def encode(event, round_number, side, names, ids):
+    """Packs one event into a RECORD, adding any new names to the battle's name table.
+
+    side is the event's side from SideTracker, None for round events.
+    """
+    def name_id(name):
+        if name is None:
+            return NO_NAME
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    kind = event.kind
+    code = KIND_CODES[kind]
+    if kind == 'round_start':
+        return RECORD.pack(event.round, code, NO_NAME, NO_NAME, 0, 0, 0, 0, 0, 0, 0)
+    if kind == 'turn':
+        return RECORD.pack(round_number, code, side, NO_NAME, event.first, 0, 0, 0, 0, 0, 0)
+    if kind == 'attack':
+        return RECORD.pack(round_number, code, side, NO_NAME, event.hit, 0, event.damage, event.hp, 0, 0, 0)
+    if kind == 'cast':
+        return RECORD.pack(round_number, code, side, name_id(event.spell), name_id(event.effect),
+                           event.roll, event.damage, event.hp, name_id(event.channel), 0, 0)
+    if kind == 'skill':
+        return RECORD.pack(round_number, code, side, name_id(event.skill), name_id(event.effect),
+                           event.roll, event.damage, event.hp, name_id(event.stat), event.modifier or 0,
+                           event.duration or 0)
+    if kind == 'effect_applied':
+        return RECORD.pack(round_number, code, side, name_id(event.source), 0,
+                           0, 0, 0, name_id(event.stat), event.modifier, event.duration)
+    if kind == 'effect_expired':
+        return RECORD.pack(round_number, code, side, name_id(event.source), 0,
+                           0, 0, 0, name_id(event.stat), event.modifier, 0)
+    if kind == 'regen':
+        return RECORD.pack(round_number, code, side, NO_NAME, 0, 0, 0, event.hp, event.mana, event.stamina, 0)
+    if kind == 'round_end':
+        (_, hp1, mana1, stamina1), (_, hp2, mana2, stamina2) = event.units
+        return RECORD.pack(event.round, code, NO_NAME, NO_NAME, 0, hp1, mana1, stamina1, hp2, mana2, stamina2)
+    raise ValueError(f"Cannot encode {kind} events")
+
+class BattleLogReader:
+    """Memory-mapped access to a binary battle log and its index."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = FILE_HEADER.unpack_from(self.data)
+        if magic != FILE_MAGIC or version != FILE_VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a version {FILE_VERSION} battle log")
+        self.offsets = {}
+        index_path = path + ".idx"
+        if os.path.exists(index_path) and os.path.getsize(index_path):
+            with open(index_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                self.offsets = {battle_id: offset for battle_id, offset in INDEX_ENTRY.iter_unpack(index)}
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def battle_ids(self):
+        return list(self.offsets)
+
+    def header(self, battle_id):
+        """(names, rounds, winner side, end reason, records offset, record count) for a battle."""
+        return self.read_header(self.offsets[battle_id])[1:]
+
+    def read_header(self, offset):
+        battle_id, count, rounds, winner, reason, table_size = BATTLE_HEADER.unpack_from(self.data, offset)
+        start = offset + BATTLE_HEADER.size
+        names = bytes(self.data[start:start + table_size]).decode().split("\0")
+        return battle_id, names, rounds, winner, END_REASONS[reason], start + table_size, count
+
+    def records(self, battle_id):
+        """Raw record tuples for a battle, without building events."""
+        _, _, _, _, first, count = self.header(battle_id)
+        return RECORD.iter_unpack(self.data[first:first + count * RECORD.size])
+
+    def events(self, battle_id):
+        """Yields a battle's events, from BattleStart to BattleEnd, as the combat modules emitted them."""
+        return self.decode(*self.header(battle_id))
+
+    def decode(self, names, rounds, winner, reason, first, count):
+        unit1, unit2 = names[0], names[1]
+        units = (unit1, unit2)
+        yield BattleStart(unit1, unit2)
+        for record in RECORD.iter_unpack(self.data[first:first + count * RECORD.size]):
+            yield decode(record, names, units)
+        yield BattleEnd(units[winner - 1] if winner else None, rounds, reason)
+
+    def __iter__(self):
+        """Yields (battle id, events) for every battle in file order, without the index."""
+        offset = FILE_HEADER.size
+        end = len(self.data)
+        while offset < end:
+            battle_id, names, rounds, winner, reason, first, count = self.read_header(offset)
+            yield battle_id, self.decode(names, rounds, winner, reason, first, count)
+            offset = first + count * RECORD.size
+
+    def close(self):
+        self.data.close()
+
+def decode(record, names, units):
+    round_number, code, actor, ability, flag, v1, v2, v3, v4, v5, v6 = record
+    kind = KINDS[code]
+
+    def name(name_id):
+        return None if name_id == NO_NAME else names[name_id]
+
+    if kind == 'round_start':
+        return RoundStart(round_number)
+    if kind == 'round_end':
+        return RoundEnd(round_number, ((units[0], v1, v2, v3), (units[1], v4, v5, v6)))
+    unit = units[actor]
+    other = units[1 - actor]
+    if kind == 'turn':
+        return Turn(unit, bool(flag))
+    if kind == 'attack':
+        return Attack(unit, other, bool(flag), v2, v3)
+    if kind == 'cast':
+        return Cast(unit, other, names[ability], name(v4), name(flag), v1, v2, v3)
+    if kind == 'skill':
+        return Skill(unit, other, names[ability], name(flag), v1, v2, v3, name(v4), v5, v6)
+    if kind == 'effect_applied':
+        return EffectApplied(unit, name(v4), v5, v6, name(ability))
+    if kind == 'effect_expired':
+        return EffectExpired(unit, name(v4), v5, name(ability))
+    return Regen(unit, v3, v4, v5)
+
+def main():
+    parser = argparse.ArgumentParser(description="Record seeded battles to a binary log, or replay battles from one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="simulate battles into a log")
+    record.add_argument("log")
+    record.add_argument("unit1")
+    record.add_argument("unit2")
+    record.add_argument("-n", "--battles", type=int, default=100)
+    record.add_argument("--seed", type=int, help="master seed (default: random, printed)")
+    show = subparsers.add_parser("show", help="narrate battles from a log")
+    show.add_argument("log")
+    show.add_argument("battle_ids", nargs="*", type=int, help="battles to show (default: list them)")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        import unit_loader
+        from combat_loop import run_battle
+        from rng_streams import battle_rng, new_master_seed
+
+        unit1 = unit_loader.load_unit(args.unit1)
+        unit2 = unit_loader.load_unit(args.unit2)
+        if not unit1 or not unit2:
+            print("Both units must exist.")
+            return
+        seed = new_master_seed() if args.seed is None else args.seed
+        writer = BinaryLogWriter(args.log)
+        first = writer.next_id
+        for index in range(args.battles):
+            run_battle(unit1, unit2, sink=writer, rng=battle_rng(seed, args.unit1, args.unit2, index))
+        writer.close()
+        print(f"Seed {seed}: battles {first}-{writer.next_id - 1} written to {args.log} "
+              f"({os.path.getsize(args.log):,} bytes in total).")
+        return
+
+    reader = BattleLogReader(args.log)
+    if not args.battle_ids:
+        for battle_id in reader.battle_ids():
+            names, rounds, winner, reason, _, count = reader.header(battle_id)
+            result = names[winner - 1] if winner else "draw"
+            print(f"{battle_id:>8}  {names[0]} vs {names[1]}: {result} after {rounds} rounds ({reason}, {count} events)")
+    narrator = ConsoleNarrator()
+    for battle_id in args.battle_ids:
+        for event in reader.events(battle_id):
+            narrator.emit(event)
+    reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# battle_replay.py
+#
+# Battles are simulated instantly into a combat_events.EventLog and played
+# back from the log at a chosen pace, so the combat loops themselves never
+# sleep. Playback runs on asyncio: any number of battles can be replayed side
+# by side, and one PlaybackControls pauses, resumes or skips all of them.
+#
+# From the command line, give unit names in pairs, one pair per battle:
+#   python battle_replay.py dark_knight goblin_guard psylocke flamecaster --pace 2
+# While replaying, type p + Enter to pause or resume and s + Enter to skip
+# to the end.
+import argparse
+import asyncio
+import sys
+import threading
+
+import unit_loader
+from combat_events import CONSOLE, ConsoleNarrator, EventLog
+from combat_loop import run_battle
+from rng_streams import battle_rng, new_master_seed
+
+class PlaybackControls:
+    """Pause, resume and skip-to-end shared by every battle in a replay."""
+
+    def __init__(self):
+        self.running = asyncio.Event()
+        self.running.set()
+        self.skipped = asyncio.Event()
+
+    @property
+    def paused(self):
+        return not self.running.is_set()
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def toggle_pause(self):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def skip_to_end(self):
+        """Drops the remaining delays; a paused replay resumes so it can finish."""
+        self.skipped.set()
+        self.running.set()
+
+    def command(self, line):
+        """Applies a typed command: 'p' toggles pause, 's' skips to the end."""
+        line = line.strip().lower()
+        if line.startswith("p"):
+            self.toggle_pause()
+        elif line.startswith("s"):
+            self.skip_to_end()
+
+    async def wait(self, seconds):
+        """Waits out the delay between rounds, plus however long playback is paused."""
+        if not self.skipped.is_set():
+            try:
+                await asyncio.wait_for(self.skipped.wait(), seconds)
+            except asyncio.TimeoutError:
+                pass
+        await self.running.wait()
+
+async def render(events, sink, pace, controls):
+    """Sends recorded events to sink, waiting `pace` seconds before every round after the first."""
+    started = False
+    for event in events:
+        if event.kind == 'round_start':
+            if started:
+                await controls.wait(pace)
+            started = True
+        elif controls.paused:
+            await controls.running.wait()
+        sink.emit(event)
+
+def read_commands(loop, controls):
+    """Forwards lines typed on stdin to controls; runs on a daemon thread."""
+    for line in sys.stdin:
+        loop.call_soon_threadsafe(controls.command, line)
+
+async def replay_many(logs, pace, labels=None, keyboard=False, out=None):
+    """Replays several event lists at once, each narration line prefixed with its label."""
+    controls = PlaybackControls()
+    if keyboard:
+        thread = threading.Thread(target=read_commands, args=(asyncio.get_running_loop(), controls), daemon=True)
+        thread.start()
+    labels = labels or [""] * len(logs)
+    sinks = [ConsoleNarrator(out=out, prefix=f"[{label}] " if label else "") for label in labels]
+    await asyncio.gather(*(render(events, sink, pace, controls) for events, sink in zip(logs, sinks)))
+
+def play(events, pace, sink=CONSOLE):
+    """Replays one battle's events to sink, blocking until it is done."""
+    async def run():
+        await render(events, sink, pace, PlaybackControls())
+    asyncio.run(run())
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate battles instantly, then replay them side by side.")
+    parser.add_argument("units", nargs="+", help="unit names in pairs, one pair per battle")
+    parser.add_argument("--pace", type=float, default=1.0, help="seconds between rounds")
+    parser.add_argument("--seed", type=int, help="master seed (default: random, printed)")
+    args = parser.parse_args()
+
+    if len(args.units) % 2:
+        parser.error("unit names must come in pairs")
+    seed = new_master_seed() if args.seed is None else args.seed
+    logs = []
+    labels = []
+    for index in range(0, len(args.units), 2):
+        name1, name2 = args.units[index], args.units[index + 1]
+        unit1 = unit_loader.load_unit(name1)
+        unit2 = unit_loader.load_unit(name2)
+        if not unit1 or not unit2:
+            print(f"Could not load {name1} and {name2}.")
+            return
+        log = EventLog()
+        run_battle(unit1, unit2, sink=log, rng=battle_rng(seed, name1, name2, index // 2))
+        logs.append(log.events)
+        labels.append(f"{index // 2 + 1}: {name1} vs {name2}" if len(args.units) > 2 else "")
+
+    keyboard = sys.stdin.isatty()
+    print(f"Seed {seed}." + (" Type p + Enter to pause or resume, s + Enter to skip to the end." if keyboard else ""))
+    asyncio.run(replay_many(logs, args.pace, labels, keyboard))
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,14 @@ from derived_stats import calculate_derived_stats
 from combat_state import CombatState
 from combat_core import resolve_action, apply_regen
 import unit_loader
+from battle_replay import play
+from combat_events import EventLog
 from combat_loop import run_battle
 import derived_stats
 
+# Seconds between rounds when a slow-mode battle is replayed
+SLOW_ROUND_SECONDS = 4
+
 def select_unit(units):
     for i, name in enumerate(units):
         print(f"[{i + 1}] {name}")
@@ -29,7 +34,13 @@ def main():
     unit2 = unit_loader.load_unit(unit2_name)
 
     slow = input("Enable slow mode? (y/n): ").lower() == "y"
-    run_battle(unit1, unit2, slow_mode=slow)
+    if slow:
+        # Simulated instantly, then replayed a round at a time
+        log = EventLog()
+        run_battle(unit1, unit2, sink=log)
+        play(log.events, SLOW_ROUND_SECONDS)
+    else:
+        run_battle(unit1, unit2)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,26 +1,19 @@
-import json
-import os
 import random
-import time
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-UNITS_DIR = os.path.join(SCRIPT_DIR, "units")
 import mage_rules
 import warrior_rules  # Import the new warrior skills module
+from abilities import compile_abilities
+from combat_loop import MAX_ROUNDS, STALEMATE_WINDOW
+from resistances import resistance_table, resisted
+from status_engine import EffectStore
+from unit_registry import REGISTRY
+from combat_events import CONSOLE, EventLog, BattleStart, RoundStart, Turn, Attack, Cast, Skill, EffectApplied, EffectExpired, Regen, RoundEnd, BattleEnd
 
-def load_unit_data(filepath):
-    try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"Error: File not found at '{filepath}'.")
-        return None
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON in '{filepath}'.")
-        return None
+# Seconds between rounds when main() replays a battle in slow mode
+SLOW_ROUND_SECONDS = 8
 
 def list_units():
-    units = [f.replace(".json", "") for f in os.listdir(UNITS_DIR) if f.endswith(".json")]
+    units = REGISTRY.names()
     if units:
         print("\n+++ AVAILABLE COMBATANTS +++")
         for i, unit in enumerate(units):
@@ -32,8 +25,7 @@ def list_units():
         return []
 
 def get_unit_by_name(unit_name):
-    filepath = os.path.join(UNITS_DIR, f"{unit_name}.json")
-    return load_unit_data(filepath)
+    return REGISTRY.get(unit_name)
 
 def calculate_derived_stats(unit_data, active_effects=None):
     """Calculates derived stats based on physical and mental attributes, considering active effects."""
@@ -49,7 +41,14 @@ def calculate_derived_stats(unit_data, active_effects=None):
     modified_int = base_int
     modified_wis = base_wis
 
-    if active_effects:
+    if isinstance(active_effects, EffectStore):
+        # Running sums; the self-buff branch below only sets an unused ac_bonus
+        modified_str += active_effects.modifier('str')
+        modified_dex += active_effects.modifier('dex')
+        modified_con += active_effects.modifier('con')
+        modified_int += active_effects.modifier('int')
+        modified_wis += active_effects.modifier('wis')
+    elif active_effects:
         for effect in active_effects:
             if effect['stat'] == 'str':
                 modified_str += effect['modifier']
@@ -100,11 +99,12 @@ def calculate_derived_stats(unit_data, active_effects=None):
 # ... (rest of your main script)
 
 
-def battle(unit1_data, unit2_data, slow_mode):
+def battle(unit1_data, unit2_data, sink=CONSOLE, rng=random,
+           max_rounds=MAX_ROUNDS, stalemate_window=STALEMATE_WINDOW):
     unit1_derived = calculate_derived_stats(unit1_data)
     unit2_derived = calculate_derived_stats(unit2_data)
-    unit1_active_effects = []
-    unit2_active_effects = []
+    unit1_active_effects = EffectStore()
+    unit2_active_effects = EffectStore()
     unit1_derived['hp_current'] = unit1_derived['hp_total']
     unit1_derived['mana_current'] = unit1_derived['mana_total']
     unit1_derived['stamina_current'] = unit1_derived['stamina_total']
@@ -118,89 +118,96 @@ def battle(unit1_data, unit2_data, slow_mode):
     unit1_temp_damage_bonus = 0
     unit2_temp_damage_bonus = 0
 
-    print("\n+++ BATTLE COMMENCES! +++")
-    print(f"{unit1_data['name']} (HP: {unit1_derived['hp_current']}/{unit1_derived['hp_total']}, AC: {unit1_derived['ac']}, Hit: +{unit1_derived['hitroll']}, Dam: +{unit1_derived['damroll']}, Mana: {unit1_derived['mana_current']}/{unit1_derived['mana_total']}, Stamina: {unit1_derived['stamina_current']}/{unit1_derived['stamina_total']})")
-    print(f"VERSUS")
-    print(f"{unit2_data['name']} (HP: {unit2_derived['hp_current']}/{unit2_derived['hp_total']}, AC: {unit2_derived['ac']}, Hit: +{unit2_derived['hitroll']}, Dam: +{unit2_derived['damroll']}, Mana: {unit2_derived['mana_current']}/{unit2_derived['mana_total']}, Stamina: {unit2_derived['stamina_current']}/{unit2_derived['stamina_total']})")
-    print("--------------------------")
+    # Resolve each unit's spells and skills once for the whole battle
+    unit1_resistances = resistance_table(unit1_data)
+    unit2_resistances = resistance_table(unit2_data)
+    unit1_spells = [a for a in compile_abilities(unit1_data) if a.kind == "spell"]
+    unit2_spells = [a for a in compile_abilities(unit2_data) if a.kind == "spell"]
+    unit1_skills = [a for a in compile_abilities(unit1_data) if a.kind == "skill"]
+    unit2_skills = [a for a in compile_abilities(unit2_data) if a.kind == "skill"]
+    available_skills_1 = [a.name for a in unit1_skills]
+    available_skills_2 = [a.name for a in unit2_skills]
+
+    if sink.active:
+        sink.emit(BattleStart(unit1_data['name'], unit2_data['name']))
 
     round_number = 1
+    end = "ko"
+    last_pools = None
+    unchanged = 0
     while unit1_derived['hp_current'] > 0 and unit2_derived['hp_current'] > 0:
-        print(f"\n++ ROUND {round_number} ++")
+        if sink.active:
+            sink.emit(RoundStart(round_number))
 
         # --- Unit 1's Turn ---
         # Apply and manage Unit 1's effects
-        effects_to_remove_1 = []
-        for i, effect in enumerate(unit1_active_effects):
-            print(f"{unit1_data['name']} is under the effect of +{effect['modifier']} {effect['stat']} for {effect['duration']} more turns.")
-            effect['duration'] -= 1
-            if effect['duration'] <= 0:
-                effects_to_remove_1.append(i)
-        for index in sorted(effects_to_remove_1, reverse=True):
-            del unit1_active_effects[index]
+        for expired in unit1_active_effects.tick():
+            if sink.active:
+                sink.emit(EffectExpired(unit1_data['name'], expired.get('stat'), expired.get('modifier', 0), expired.get('source')))
         unit1_derived.update(calculate_derived_stats(unit1_data, unit1_active_effects))
 
-        print(f"{unit1_data['name']} considers their actions...")
+        if sink.active:
+            sink.emit(Turn(unit1_data['name'], True))
         action1 = "attack"  # Default action
         possible_actions_1 = ["attack"]
-        can_unit1_cast = "can_cast" in unit1_data['tags'] and unit1_spell_cooldown <= 0
+        can_unit1_cast = unit1_spells and unit1_spell_cooldown <= 0
         if can_unit1_cast:
             possible_actions_1.append("cast")
-        available_skills_1 = [tag[6:] for tag in unit1_data['tags'] if tag.startswith("skill_")]
         can_unit1_use_skill = any(
-            warrior_rules.get_skill_cost(unit1_data, skill) <= unit1_derived['stamina_current'] and
-            unit1_skill_cooldowns.get(skill, 0) <= 0
-            for skill in available_skills_1
+            skill.cost <= unit1_derived['stamina_current'] and
+            unit1_skill_cooldowns.get(skill.name, 0) <= 0
+            for skill in unit1_skills
         )
-        if can_unit1_use_skill and available_skills_1:
+        if can_unit1_use_skill:
             possible_actions_1.append("skill")
 
-        chosen_action_type_1 = random.choice(possible_actions_1)
+        chosen_action_type_1 = rng.choice(possible_actions_1)
 
         if chosen_action_type_1 == "attack":
-            attack_roll_1 = random.randint(1, 20) + unit1_derived['hitroll']
-            print(f"  ...swings their weapon...")
-            damage_roll = random.randint(1, 4) + unit1_derived['damroll'] + unit1_temp_damage_bonus
+            attack_roll_1 = rng.randint(1, 20) + unit1_derived['hitroll']
+            damage_roll = rng.randint(1, 4) + unit1_derived['damroll'] + unit1_temp_damage_bonus
             unit1_temp_damage_bonus = 0  # Reset temporary damage bonus
-            if attack_roll_1 >= unit2_derived['ac']:
+            hit = attack_roll_1 >= unit2_derived['ac']
+            if hit:
                 unit2_derived['hp_current'] -= damage_roll
-                print(f"    ...a solid hit! {unit2_data['name']} takes {damage_roll} damage. [HP: {unit2_derived['hp_current']}]")
-            else:
-                print(f"    ...misses their foe!")
+            if sink.active:
+                sink.emit(Attack(unit1_data['name'], unit2_data['name'], hit, damage_roll if hit else 0, unit2_derived['hp_current']))
         elif chosen_action_type_1 == "cast":
-            available_spells = [tag[6:] for tag in unit1_data['tags'] if tag.startswith("spell_")]
-            if available_spells:
-                chosen_spell = mage_rules.choose_action(unit1_data, unit2_data, unit1_derived['mana_current'], True).split('_')[1]
-                spell_cost = mage_rules.get_spell_cost(unit1_data, chosen_spell)
-                spell_cooldown = mage_rules.get_spell_cooldown(chosen_spell)
-                if spell_cost is not None and unit1_derived['mana_current'] >= spell_cost:
-                    unit1_derived['mana_current'] -= spell_cost
-                    spell_result = mage_rules.cast_spell(unit1_data, unit2_data, chosen_spell)
-                    if isinstance(spell_result, dict) and "effect" in spell_result:
-                        unit1_active_effects.append(spell_result)
-                    elif isinstance(spell_result, int): # Damage or heal
-                        unit2_derived['hp_current'] -= spell_result
-                        print(f"  ...caused {spell_result} damage/healing. [HP: {unit2_derived['hp_current']}], [Mana: {unit1_derived['mana_current']}]")
-                    else:
-                        print(f"  ...had no immediate effect.")
-                    unit1_spell_cooldown = spell_cooldown
+            spell = next((spell for spell in unit1_spells if spell.cost <= unit1_derived['mana_current']), None)
+            if spell:
+                unit1_derived['mana_current'] -= spell.cost
+                spell_result = mage_rules.cast_spell(unit1_data, unit2_data, spell.name, rng)
+                if isinstance(spell_result, dict):
+                    dealt = 0
+                    if spell_result['type'] == "damage":
+                        dealt = resisted(unit2_resistances, spell_result['amount'], spell.channel_index)
+                        unit2_derived['hp_current'] -= dealt
+                    if sink.active:
+                        sink.emit(Cast(unit1_data['name'], unit2_data['name'], spell.name, spell_result['channel'], spell_result['type'],
+                                       abs(spell_result['amount']), dealt, unit2_derived['hp_current']))
+                unit1_spell_cooldown = spell.cooldown
         elif chosen_action_type_1 == "skill":
             usable_skill = warrior_rules.choose_skill(
-                unit1_data, unit2_data, unit1_derived['stamina_current'], available_skills_1, unit1_skill_cooldowns
+                unit1_data, unit2_data, unit1_derived['stamina_current'], available_skills_1, unit1_skill_cooldowns, rng
             )
             if usable_skill:
                 skill_cost = warrior_rules.get_skill_cost(unit1_data, usable_skill)
                 unit1_derived['stamina_current'] -= skill_cost
-                skill_result = warrior_rules.use_skill(unit1_data, unit2_data, usable_skill)
+                skill_result = warrior_rules.use_skill(unit1_data, unit2_data, usable_skill, rng)
                 skill_cooldown = warrior_rules.get_skill_cooldown(usable_skill)
                 unit1_skill_cooldowns[usable_skill] = skill_cooldown
                 if isinstance(skill_result, dict) and "effect" in skill_result:
-                    unit1_active_effects.append(skill_result['effect'])
-                elif isinstance(skill_result, int): # Direct damage (not currently implemented in warrior_rules)
+                    effect = skill_result['effect']
+                    unit1_active_effects.add(effect)
+                    if sink.active:
+                        sink.emit(Skill(unit1_data['name'], unit2_data['name'], usable_skill, warrior_rules.SKILL_DATA[usable_skill]['effect'], 0, 0,
+                                        unit2_derived['hp_current'], effect['stat'], effect['modifier'], effect['duration']))
+                        sink.emit(EffectApplied(unit1_data['name'], effect['stat'], effect['modifier'], effect['duration'], effect['source']))
+                elif isinstance(skill_result, int): # Direct damage
                     unit2_derived['hp_current'] -= skill_result
-                    print(f"  ...dealt {skill_result} damage. [HP: {unit2_derived['hp_current']}], [Stamina: {unit1_derived['stamina_current']}]")
-                elif skill_result is None and usable_skill == "power_strike":
-                    print(f"  ...prepares a powerful strike!")
+                    if sink.active:
+                        sink.emit(Skill(unit1_data['name'], unit2_data['name'], usable_skill, "damage", skill_result, skill_result,
+                                        unit2_derived['hp_current'], None, 0, 0))
 
         # Decrement Unit 1's cooldowns
         if unit1_spell_cooldown > 0:
@@ -217,79 +224,73 @@ def battle(unit1_data, unit2_data, slow_mode):
 
         # --- Unit 2's Turn ---
         # Apply and manage Unit 2's effects
-        effects_to_remove_2 = []
-        for i, effect in enumerate(unit2_active_effects):
-            print(f"{unit2_data['name']} is under the effect of +{effect['modifier']} {effect['stat']} for {effect['duration']} more turns.")
-            effect['duration'] -= 1
-            if effect['duration'] <= 0:
-                effects_to_remove_2.append(i)
-        for index in sorted(effects_to_remove_2, reverse=True):
-            del unit2_active_effects[index]
+        for expired in unit2_active_effects.tick():
+            if sink.active:
+                sink.emit(EffectExpired(unit2_data['name'], expired.get('stat'), expired.get('modifier', 0), expired.get('source')))
         unit2_derived.update(calculate_derived_stats(unit2_data, unit2_active_effects))
 
-        print(f"\n{unit2_data['name']} prepares their response...")
+        if sink.active:
+            sink.emit(Turn(unit2_data['name'], False))
         action2 = "attack"  # Default action
         possible_actions_2 = ["attack"]
-        can_unit2_cast = "can_cast" in unit2_data['tags'] and unit2_spell_cooldown <= 0
+        can_unit2_cast = unit2_spells and unit2_spell_cooldown <= 0
         if can_unit2_cast:
             possible_actions_2.append("cast")
-        available_skills_2 = [tag[6:] for tag in unit2_data['tags'] if tag.startswith("skill_")]
         can_unit2_use_skill = any(
-            warrior_rules.get_skill_cost(unit2_data, skill) <= unit2_derived['stamina_current'] and
-            unit2_skill_cooldowns.get(skill, 0) <= 0
-            for skill in available_skills_2
+            skill.cost <= unit2_derived['stamina_current'] and
+            unit2_skill_cooldowns.get(skill.name, 0) <= 0
+            for skill in unit2_skills
         )
-        if can_unit2_use_skill and available_skills_2:
+        if can_unit2_use_skill:
             possible_actions_2.append("skill")
 
-        chosen_action_type_2 = random.choice(possible_actions_2)
+        chosen_action_type_2 = rng.choice(possible_actions_2)
         
         if chosen_action_type_2 == "attack":
-            attack_roll_2 = random.randint(1, 20) + unit2_derived['hitroll']
-            print(f"  ...strikes back with their weapon...")
-            damage_roll = random.randint(1, 4) + unit2_derived['damroll'] + unit2_temp_damage_bonus
+            attack_roll_2 = rng.randint(1, 20) + unit2_derived['hitroll']
+            damage_roll = rng.randint(1, 4) + unit2_derived['damroll'] + unit2_temp_damage_bonus
             unit2_temp_damage_bonus = 0  # Reset temporary damage bonus
-            if attack_roll_2 >= unit1_derived['ac']:
+            hit = attack_roll_2 >= unit1_derived['ac']
+            if hit:
                 unit1_derived['hp_current'] -= damage_roll
-                print(f"    ...a telling blow! {unit1_data['name']} suffers {damage_roll} damage. [HP: {unit1_derived['hp_current']}]")
-            else:
-                print(f"    ...their attack fails to find purchase!")
+            if sink.active:
+                sink.emit(Attack(unit2_data['name'], unit1_data['name'], hit, damage_roll if hit else 0, unit1_derived['hp_current']))
         elif chosen_action_type_2 == "cast":
-            available_spells = [tag[6:] for tag in unit2_data['tags'] if tag.startswith("spell_")]
-          
-            if available_spells:
-                print(f"Spell cooldown (Unit1): {unit1_spell_cooldown}")
-                chosen_spell = mage_rules.choose_action(unit2_data, unit1_data, unit2_derived['mana_current'], True).split('_')[1]
-                spell_cost = mage_rules.get_spell_cost(unit2_data, chosen_spell)
-                spell_cooldown = mage_rules.get_spell_cooldown(chosen_spell)
-                if spell_cost is not None and unit2_derived['mana_current'] >= spell_cost:
-                    unit2_derived['mana_current'] -= spell_cost
-                    spell_result = mage_rules.cast_spell(unit2_data, unit1_data, chosen_spell)
-                    if isinstance(spell_result, dict) and "effect" in spell_result:
-                        unit2_active_effects.append(spell_result)
-                    elif isinstance(spell_result, int): # Damage or heal
-                        unit1_derived['hp_current'] -= spell_result
-                        print(f"  ...caused {spell_result} damage/healing. [HP: {unit1_derived['hp_current']}], [Mana: {unit2_derived['mana_current']}]")
-                    else:
-                        print(f"  ...had no immediate effect.")
-                    unit2_spell_cooldown = spell_cooldown
+            spell = next((spell for spell in unit2_spells if spell.cost <= unit2_derived['mana_current']), None)
+            if spell:
+                unit2_derived['mana_current'] -= spell.cost
+                spell_result = mage_rules.cast_spell(unit2_data, unit1_data, spell.name, rng)
+                if isinstance(spell_result, dict):
+                    dealt = 0
+                    if spell_result['type'] == "damage":
+                        dealt = resisted(unit1_resistances, spell_result['amount'], spell.channel_index)
+                        unit1_derived['hp_current'] -= dealt
+                    if sink.active:
+                        sink.emit(Cast(unit2_data['name'], unit1_data['name'], spell.name, spell_result['channel'], spell_result['type'],
+                                       abs(spell_result['amount']), dealt, unit1_derived['hp_current']))
+                unit2_spell_cooldown = spell.cooldown
         elif chosen_action_type_2 == "skill":
             usable_skill = warrior_rules.choose_skill(
-                unit2_data, unit1_data, unit2_derived['stamina_current'], available_skills_2, unit2_skill_cooldowns
+                unit2_data, unit1_data, unit2_derived['stamina_current'], available_skills_2, unit2_skill_cooldowns, rng
             )
             if usable_skill:
                 skill_cost = warrior_rules.get_skill_cost(unit2_data, usable_skill)
                 unit2_derived['stamina_current'] -= skill_cost
-                skill_result = warrior_rules.use_skill(unit2_data, unit1_data, usable_skill)
+                skill_result = warrior_rules.use_skill(unit2_data, unit1_data, usable_skill, rng)
                 skill_cooldown = warrior_rules.get_skill_cooldown(usable_skill)
                 unit2_skill_cooldowns[usable_skill] = skill_cooldown
                 if isinstance(skill_result, dict) and "effect" in skill_result:
-                    unit2_active_effects.append(skill_result['effect'])
-                elif isinstance(skill_result, int): # Direct damage (not currently implemented in warrior_rules)
+                    effect = skill_result['effect']
+                    unit2_active_effects.add(effect)
+                    if sink.active:
+                        sink.emit(Skill(unit2_data['name'], unit1_data['name'], usable_skill, warrior_rules.SKILL_DATA[usable_skill]['effect'], 0, 0,
+                                        unit1_derived['hp_current'], effect['stat'], effect['modifier'], effect['duration']))
+                        sink.emit(EffectApplied(unit2_data['name'], effect['stat'], effect['modifier'], effect['duration'], effect['source']))
+                elif isinstance(skill_result, int): # Direct damage
                     unit1_derived['hp_current'] -= skill_result
-                    print(f"  ...dealt {skill_result} damage. [HP: {unit1_derived['hp_current']}], [Stamina: {unit2_derived['stamina_current']}]")
-                elif skill_result is None and usable_skill == "power_strike":
-                    print(f"  ...prepares a powerful strike!")
+                    if sink.active:
+                        sink.emit(Skill(unit2_data['name'], unit1_data['name'], usable_skill, "damage", skill_result, skill_result,
+                                        unit1_derived['hp_current'], None, 0, 0))
 
         # Decrement Unit 2's cooldowns
         if unit2_spell_cooldown > 0:
@@ -314,23 +315,39 @@ def battle(unit1_data, unit2_data, slow_mode):
         unit2_derived['stamina_total'])
         unit2_derived['stamina_current'] = min(unit2_derived['stamina_current'] + unit2_derived['stamina_regen'], unit2_derived['stamina_total'])
 
-        # Display end-of-round stats
-        print(f"\n++ END OF ROUND {round_number} ++")
-        print(f"{unit1_data['name']} (HP: {unit1_derived['hp_current']}/{unit1_derived['hp_total']}, Mana: {unit1_derived['mana_current']}/{unit1_derived['mana_total']}, Stamina: {unit1_derived['stamina_current']}/{unit1_derived['stamina_total']})")
-        print(f"{unit2_data['name']} (HP: {unit2_derived['hp_current']}/{unit2_derived['hp_total']}, Mana: {unit2_derived['mana_current']}/{unit2_derived['mana_total']}, Stamina: {unit2_derived['stamina_current']}/{unit2_derived['stamina_total']})")
-        print("--------------------------")
-
-        if slow_mode:
-            time.sleep(8)
+        # Report end-of-round stats
+        if sink.active:
+            unit1_status = (unit1_data['name'], unit1_derived['hp_current'], unit1_derived['mana_current'], unit1_derived['stamina_current'])
+            unit2_status = (unit2_data['name'], unit2_derived['hp_current'], unit2_derived['mana_current'], unit2_derived['stamina_current'])
+            sink.emit(Regen(*unit1_status))
+            sink.emit(Regen(*unit2_status))
+            sink.emit(RoundEnd(round_number, (unit1_status, unit2_status)))
+
+        # Draw when nothing changes for a whole window, or at the round cap
+        if unit1_active_effects or unit2_active_effects:
+            last_pools = None
+            unchanged = 0
+        else:
+            pools = tuple(derived[pool] for derived in (unit1_derived, unit2_derived)
+                          for pool in ('hp_current', 'mana_current', 'stamina_current'))
+            unchanged = unchanged + 1 if pools == last_pools else 0
+            last_pools = pools
+            if unchanged >= stalemate_window:
+                end = "stalemate"
+                break
+        if round_number >= max_rounds:
+            end = "round_cap"
+            break
 
         round_number += 1
 
-    print("\n+++ BATTLE ENDS! +++")
-    if unit1_derived['hp_current'] <= 0:
-        print(f"{unit2_data['name']} has vanquished {unit1_data['name']}!")
+    if end != "ko":
+        winner = None
     else:
-        print(f"{unit1_data['name']} stands victorious over {unit2_data['name']}!")
-    print("++++++++++++++++++++++")
+        winner = (unit2_data if unit1_derived['hp_current'] <= 0 else unit1_data)['name']
+    if sink.active:
+        sink.emit(BattleEnd(winner, round_number, end))
+    return {'winner': winner, 'rounds': round_number, 'end': end}
 
 def main():
     available_units = list_units()
@@ -369,7 +386,14 @@ def main():
     slow_mode = input("\nEngage slow mode (8 seconds per round)? [y/N]: ").lower() == 'y'
 
     if unit1_data and unit2_data:
-        battle(unit1_data, unit2_data, slow_mode)
+        if slow_mode:
+            # Simulated instantly, then replayed a round at a time
+            from battle_replay import play
+            log = EventLog()
+            battle(unit1_data, unit2_data, sink=log)
+            play(log.events, SLOW_ROUND_SECONDS)
+        else:
+            battle(unit1_data, unit2_data)
     else:
         print("Alas, some combatants could not be summoned. The battle is postponed.")
 
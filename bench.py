@@ -0,0 +1,235 @@
+# bench.py
+#
+# Speed benchmarks for the combat engines on fixed unit pairs and fixed
+# seeds, so numbers from different commits are comparable. Every run is
+# appended to a JSON history file; --compare checks the run against a
+# stored baseline and exits non-zero if anything regressed by more than
+# the tolerance.
+#
+# Memory is measured in separate passes so it doesn't slow the timed runs.
+# blocks_per_round is the change in sys.getallocatedblocks() across the
+# benchmark battles, with the cyclic collector paused, over their rounds:
+# the blocks each round leaves allocated, whether kept alive or garbage
+# waiting for the collector. CPython only exposes the live block count, so
+# objects freed by reference counting within the round don't show.
+# peak_kib_per_battle is tracemalloc's peak traced memory for one battle.
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import battle_simulator
+import status_engine
+import unit_loader
+from combat_core import choose_resolved_action
+from combat_events import NULL
+from combat_loop import run_battle
+from combat_state import Combatant
+from derived_stats import calculate_derived_stats
+from rng_streams import battle_rng
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(SCRIPT_DIR, "bench_history.json")
+BENCH_SEED = 20240601
+# Melee-only, caster and skill-user matchups
+BENCH_PAIRS = [("dark_knight", "goblin_guard"), ("psylocke", "flamecaster"), ("iron_guard", "croakbrute")]
+BENCH_EFFECTS = [
+    {"stat": "str", "modifier": 3, "duration": 3, "source": "bench"},
+    {"stat": "dex", "modifier": -15, "duration": 2, "source": "bench"},
+]
+# Metrics where a higher value is better; everything else should not grow
+THROUGHPUT_METRICS = ("battles_per_sec", "rounds_per_sec", "calls_per_sec")
+
+def load_pairs():
+    pairs = []
+    for name1, name2 in BENCH_PAIRS:
+        unit1 = unit_loader.load_unit(name1)
+        unit2 = unit_loader.load_unit(name2)
+        if unit1 and unit2:
+            pairs.append((unit1, unit2))
+    return pairs
+
+def best_time(run, repeat):
+    """Fastest of `repeat` runs of run() as (seconds, run's return value)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, value)
+    return best
+
+def allocated_blocks(run):
+    """(change in allocated blocks across run(), run's return value), with the cyclic collector paused."""
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        value = run()
+        after = sys.getallocatedblocks()
+    finally:
+        gc.enable()
+    return after - before, value
+
+def peak_kib(run):
+    """Peak memory traced while run() executes, above what was live before it, in KiB."""
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+# === Benchmarks ===
+def bench_engine(play, pairs, battles, repeat):
+    """Throughput of play(unit1, unit2, rng) -> rounds over `battles` seeded battles per pair."""
+    def run():
+        rounds = 0
+        for unit1, unit2 in pairs:
+            for index in range(battles):
+                rounds += play(unit1, unit2, battle_rng(BENCH_SEED, unit1['name'], unit2['name'], index))
+        return rounds
+
+    seconds, rounds = best_time(run, repeat)
+    total = battles * len(pairs)
+    blocks, _ = allocated_blocks(run)
+    unit1, unit2 = pairs[0]
+    peak = peak_kib(lambda: play(unit1, unit2, battle_rng(BENCH_SEED, "memory")))
+    return {
+        'battles_per_sec': total / seconds,
+        'rounds_per_sec': rounds / seconds,
+        'rounds_per_battle': rounds / total,
+        'blocks_per_round': blocks / rounds,
+        'peak_kib_per_battle': peak,
+    }
+
+def play_run_battle(unit1, unit2, rng):
+    return run_battle(unit1, unit2, quiet=True, rng=rng)['rounds']
+
+def play_battle_simulator(unit1, unit2, rng):
+    return battle_simulator.battle(unit1, unit2, sink=NULL, rng=rng)['rounds']
+
+def bench_calls(call, calls, repeat):
+    def run():
+        for _ in range(calls):
+            call()
+
+    seconds, _ = best_time(run, repeat)
+    return {'calls_per_sec': calls / seconds}
+
+def run_benchmarks(battles=200, calls=100000, repeat=3):
+    pairs = load_pairs()
+    if not pairs:
+        print("None of the benchmark units could be loaded.")
+        return {}
+    unit = pairs[0][0]
+    derived = calculate_derived_stats(unit)
+    combatants = [Combatant(unit1) for unit1, _ in pairs]
+
+    def select_actions():
+        for combatant in combatants:
+            choose_resolved_action(combatant)
+
+    return {
+        'run_battle': bench_engine(play_run_battle, pairs, battles, repeat),
+        'battle_simulator.battle': bench_engine(play_battle_simulator, pairs, battles, repeat),
+        'calculate_derived_stats': bench_calls(lambda: calculate_derived_stats(unit, BENCH_EFFECTS), calls, repeat),
+        'apply_effects': bench_calls(lambda: status_engine.apply_effects(dict(derived), BENCH_EFFECTS), calls, repeat),
+        'choose_resolved_action': bench_calls(select_actions, calls // len(combatants), repeat),
+    }
+
+# === History and comparison ===
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def save_history(path, history):
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+def find_baseline(history):
+    """The newest run marked as baseline, else the oldest run."""
+    for entry in reversed(history):
+        if entry.get('baseline'):
+            return entry
+    return history[0] if history else None
+
+def compare(results, baseline, tolerance):
+    """Lists (benchmark, metric, baseline, current, change) for every metric that regressed."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline['results'].get(name, {}).get(metric)
+            if not before or metric == 'rounds_per_battle':
+                continue
+            change = value / before - 1
+            worse = -change if metric in THROUGHPUT_METRICS else change
+            if worse > tolerance:
+                regressions.append((name, metric, before, value, change))
+    return regressions
+
+def print_results(results):
+    for name, metrics in results.items():
+        values = ", ".join(f"{metric} {value:,.2f}" for metric, value in metrics.items())
+        print(f"{name:<26} {values}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the combat engines on fixed pairs and seeds.")
+    parser.add_argument("-n", "--battles", type=int, default=200, help="battles per benchmark pair")
+    parser.add_argument("--calls", type=int, default=100000, help="calls for the micro-benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="keep the best of this many timed runs")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON file runs are appended to")
+    parser.add_argument("--set-baseline", action="store_true", help="mark this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="flag regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed slowdown (or memory growth) before a metric counts as regressed")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.battles, args.calls, args.repeat)
+    if not results:
+        return
+    print_results(results)
+
+    history = load_history(args.history)
+    baseline = find_baseline(history)
+    history.append({
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'baseline': args.set_baseline,
+        'results': results,
+    })
+    save_history(args.history, history)
+
+    if args.compare:
+        if baseline is None:
+            print("\nNo baseline yet; this run is the first in the history.")
+            return
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\nCompared with the baseline from {baseline['time']} ({baseline.get('revision') or 'unknown revision'}):")
+        if not regressions:
+            print(f"  no regressions beyond {args.tolerance:.0%}")
+            return
+        for name, metric, before, value, change in regressions:
+            print(f"  REGRESSION {name} {metric}: {before:,.1f} -> {value:,.1f} ({change:+.1%})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,107 +1,109 @@
 import random
 import mage_rules
 import warrior_rules
-from derived_stats import calculate_derived_stats
+from combat_events import NULL, Attack, Cast, Skill, EffectApplied
+from resistances import resisted
+from status_engine import tick_and_clean_effects
 
-# === Fallback attack ===
-def fallback_attack(attacker, defender, attacker_derived, defender_derived):
-    print(f"  {attacker['name']} swings their weapon...")
-    attack_roll = random.randint(1, 20) + attacker_derived['hitroll']
-    if attack_roll >= defender_derived['ac']:
-        damage = random.randint(1, 4) + attacker_derived['damroll']
-        defender_derived['hp_current'] -= damage
-        print(f"    ...solid hit! {defender['name']} takes {damage} physical damage. [HP: {defender_derived['hp_current']}]")
-    else:
-        print(f"    ...misses!")
+# Bump whenever a change to the battle rules can change outcomes; stored
+# results (see matchup_cache) from older versions are then ignored
+ENGINE_VERSION = 2
 
-# === Resistance-aware damage application ===
-def apply_damage_resistance(target, amount, channel="generic"):
-    resists = target.get("resistances", {})
-    reduction = resists.get(channel, 0)
-    reduced = max(0, int(amount * (1 - reduction / 100)))
-    return reduced
+# === Fallback attack ===
+def fallback_attack(attacker, defender, sink=NULL, rng=random):
+    attack_roll = rng.randint(1, 20) + attacker.hitroll
+    if attack_roll >= defender.ac:
+        damage = rng.randint(1, 4) + attacker.damroll
+        defender.hp_current -= damage
+        if sink.active:
+            sink.emit(Attack(attacker.name, defender.name, True, damage, defender.hp_current))
+    elif sink.active:
+        sink.emit(Attack(attacker.name, defender.name, False, 0, defender.hp_current))
 
 # === Action resolver ===
-def choose_resolved_action(unit, derived, cooldowns):
-    spell_cd = cooldowns.get('spell_cooldown', 0)
-    skill_cd = cooldowns.get('skill_cooldown', 0)
-
-    if "can_cast" in unit['tags'] and spell_cd <= 0:
-        spells = [tag[6:] for tag in unit['tags'] if tag.startswith("spell_")]
-        for spell in spells:
-            if mage_rules.get_spell_cost(unit, spell) <= derived['mana_current']:
-                return ("cast", spell)
-
-    if skill_cd <= 0:
-        skills = [tag[6:] for tag in unit['tags'] if tag.startswith("skill_")]
-        for skill in skills:
-            if warrior_rules.get_skill_cost(unit, skill) <= derived['stamina_current']:
-                return ("skill", skill)
-
-    return ("attack", None)
+# Scans the combatant's precompiled abilities: the first affordable spell if
+# the spell cooldown is up, else the first affordable skill, else None for a
+# plain attack.
+def choose_resolved_action(combatant):
+    spell_ready = combatant.spell_cooldown <= 0
+    skill_ready = combatant.skill_cooldown <= 0
+    for ability in combatant.abilities:
+        if ability.kind == "spell":
+            if spell_ready and ability.cost <= combatant.mana_current:
+                return ability
+        elif skill_ready and ability.cost <= combatant.stamina_current:
+            return ability
+    return None
 
 # === Main action execution ===
-def resolve_action(unit, opponent, derived, opp_derived, active_effects, cooldowns):
-    # Update attacker stats with current effects
-    current_derived = calculate_derived_stats(unit, active_effects, derived)
-
-    # Update opponent stats in-place to preserve reference
-    opponent_derived_new = calculate_derived_stats(opponent, [], opp_derived)
-    opp_derived.update(opponent_derived_new)
+# Both combatants are updated in place. Returns the action actually taken:
+# "cast", "skill" or "attack". Every roll is drawn from rng, which defaults to
+# the global random module.
+def resolve_action(actor, target, sink=NULL, rng=random):
+    # Attacker acts with its current effects; the defender is judged on its
+    # unmodified stats
+    actor.refresh_stats()
+    target.refresh_stats(with_effects=False)
+    return take_action(actor, target, sink, rng)
 
-    action_type, value = choose_resolved_action(unit, current_derived, cooldowns)
+# resolve_action once both combatants' stats are refreshed; run_battle calls
+# it directly when it times the refreshes separately
+def take_action(actor, target, sink=NULL, rng=random):
+    ability = choose_resolved_action(actor)
 
-    if action_type == "cast":
-        cost = mage_rules.get_spell_cost(unit, value)
-        cooldown = mage_rules.get_spell_cooldown(value)
-        if cost is not None and current_derived['mana_current'] >= cost:
-            current_derived['mana_current'] -= cost
-            result = mage_rules.cast_spell(unit, opponent, value)
-            if isinstance(result, dict):
-                if result.get("type") == "damage":
-                    adjusted = apply_damage_resistance(opponent, result['amount'], result.get("channel", "generic"))
-                    opp_derived['hp_current'] -= adjusted
-                    print(f"  {unit['name']} casts {value} for {adjusted} damage! [HP: {opp_derived['hp_current']}]")
-                elif "effect" in result:
-                    active_effects.append(result["effect"])
-            cooldowns['spell_cooldown'] = cooldown
-            return
+    if ability is None:
+        fallback_attack(actor, target, sink, rng)
+        return "attack"
 
-    elif action_type == "skill":
-        cost = warrior_rules.get_skill_cost(unit, value)
-        cooldown = warrior_rules.get_skill_cooldown(value)
-        if cost is not None and current_derived['stamina_current'] >= cost:
-            current_derived['stamina_current'] -= cost
-            result = warrior_rules.use_skill(unit, opponent, value)
-            if isinstance(result, dict) and "effect" in result:
-                active_effects.append(result["effect"])
-            elif isinstance(result, int):
-                opp_derived['hp_current'] -= result
-                print(f"  {unit['name']} uses {value} for {result} damage! [HP: {opp_derived['hp_current']}]")
-            cooldowns['skill_cooldown'] = cooldown
-            return
+    if ability.kind == "spell":
+        actor.mana_current -= ability.cost
+        result = mage_rules.cast_spell(actor.unit, target.unit, ability.name, rng)
+        if isinstance(result, dict):
+            if result.get("type") == "damage":
+                adjusted = resisted(target.resistance_table, result['amount'], ability.channel_index)
+                target.hp_current -= adjusted
+                if sink.active:
+                    sink.emit(Cast(actor.name, target.name, ability.name, result['channel'], "damage",
+                                   result['amount'], adjusted, target.hp_current))
+            elif "effect" in result:
+                actor.add_effect(result["effect"])
+            elif sink.active:
+                sink.emit(Cast(actor.name, target.name, ability.name, result['channel'], result['type'],
+                               abs(result['amount']), 0, target.hp_current))
+        actor.spell_cooldown = ability.cooldown
+        return "cast"
 
-    fallback_attack(unit, opponent, current_derived, opp_derived)
+    actor.stamina_current -= ability.cost
+    result = warrior_rules.use_skill(actor.unit, target.unit, ability.name, rng)
+    if isinstance(result, dict) and "effect" in result:
+        effect = result["effect"]
+        actor.add_effect(effect)
+        if sink.active:
+            sink.emit(Skill(actor.name, target.name, ability.name, ability.effect, 0, 0,
+                            target.hp_current, effect['stat'], effect['modifier'], effect['duration']))
+            sink.emit(EffectApplied(actor.name, effect['stat'], effect['modifier'],
+                                    effect['duration'], effect['source']))
+    elif isinstance(result, int):
+        target.hp_current -= result
+        if sink.active:
+            sink.emit(Skill(actor.name, target.name, ability.name, "damage", result, result,
+                            target.hp_current, None, 0, 0))
+    actor.skill_cooldown = ability.cooldown
+    return "skill"
 
 # === End-of-round regen ===
-def apply_regen(derived):
-    derived['hp_current'] = min(derived['hp_total'], derived['hp_current'] + derived['hp_regen'])
-    derived['mana_current'] = min(derived['mana_total'], derived['mana_current'] + derived['mana_regen'])
-    derived['stamina_current'] = min(derived['stamina_total'], derived['stamina_current'] + derived['stamina_regen'])
+def apply_regen(combatant):
+    combatant.hp_current = min(combatant.hp_total, combatant.hp_current + combatant.hp_regen)
+    combatant.mana_current = min(combatant.mana_total, combatant.mana_current + combatant.mana_regen)
+    combatant.stamina_current = min(combatant.stamina_total, combatant.stamina_current + combatant.stamina_regen)
 
 # === Effect tick ===
-def process_effects(effects):
-    expired = []
-    for effect in effects:
-        effect['duration'] -= 1
-        if effect['duration'] <= 0:
-            expired.append(effect)
-    for e in expired:
-        effects.remove(e)
+def process_effects(combatant, sink=NULL):
+    tick_and_clean_effects(combatant.effects, sink, combatant.name)
 
 # === Cooldown tick ===
-def tick_cooldowns(cooldowns):
-    if cooldowns.get('spell_cooldown', 0) > 0:
-        cooldowns['spell_cooldown'] -= 1
-    if cooldowns.get('skill_cooldown', 0) > 0:
-        cooldowns['skill_cooldown'] -= 1
\ No newline at end of file
+def tick_cooldowns(combatant):
+    if combatant.spell_cooldown > 0:
+        combatant.spell_cooldown -= 1
+    if combatant.skill_cooldown > 0:
+        combatant.skill_cooldown -= 1
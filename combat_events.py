@@ -0,0 +1,177 @@
+# combat_events.py
+#
+# Combat modules report what happens through typed events sent to a sink
+# instead of printing. Events only carry raw values; turning them into text
+# is the console narrator's job, so sinks that don't print never pay for
+# formatting. Emitters guard each event with `if sink.active:` so the null
+# sink doesn't even pay for building the event.
+import json
+import sys
+from collections import Counter, namedtuple
+
+import debug
+
+def event_type(name, kind, fields):
+    """Creates a namedtuple event class tagged with its kind."""
+    cls = namedtuple(name, fields)
+    return type(name, (cls,), {'__slots__': (), 'kind': kind})
+
+BattleStart = event_type('BattleStart', 'battle_start', 'unit1 unit2')
+RoundStart = event_type('RoundStart', 'round_start', 'round')
+Turn = event_type('Turn', 'turn', 'actor first')
+Attack = event_type('Attack', 'attack', 'actor target hit damage hp')
+Cast = event_type('Cast', 'cast', 'actor target spell channel effect roll damage hp')
+Skill = event_type('Skill', 'skill', 'actor target skill effect roll damage hp stat modifier duration')
+EffectApplied = event_type('EffectApplied', 'effect_applied', 'unit stat modifier duration source')
+EffectExpired = event_type('EffectExpired', 'effect_expired', 'unit stat modifier source')
+Regen = event_type('Regen', 'regen', 'unit hp mana stamina')
+RoundEnd = event_type('RoundEnd', 'round_end', 'round units')
+BattleEnd = event_type('BattleEnd', 'battle_end', 'winner rounds reason')
+
+EVENT_TYPES = {cls.kind: cls for cls in (BattleStart, RoundStart, Turn, Attack, Cast, Skill,
+                                          EffectApplied, EffectExpired, Regen, RoundEnd, BattleEnd)}
+
+# How a battle ended: 'ko' when a unit fell, otherwise the kind of draw
+DRAW_REASONS = {
+    'round_cap': " (round limit reached)",
+    'stalemate': " (neither side can make progress)",
+}
+
+# What the console has always shown; debug.py flags add the rest
+NARRATION_KINDS = frozenset({
+    'battle_start', 'round_start', 'turn', 'attack', 'cast', 'skill', 'round_end', 'battle_end',
+})
+
+def debug_kinds():
+    kinds = set(NARRATION_KINDS)
+    if debug.DEBUG_EFFECTS:
+        kinds |= {'effect_applied', 'effect_expired'}
+    if debug.DEBUG_STATS:
+        kinds.add('regen')
+    return frozenset(kinds)
+
+class NullSink:
+    """Discards everything. Emitters skip building events when a sink is inactive."""
+    active = False
+
+    def emit(self, event):
+        pass
+
+class ConsoleNarrator:
+    """Prints battle narration, formatting each event only when it is shown."""
+    active = True
+
+    def __init__(self, kinds=None, out=None, prefix=""):
+        self.kinds = debug_kinds() if kinds is None else frozenset(kinds)
+        self.out = out
+        self.prefix = prefix
+
+    def emit(self, event):
+        if event.kind in self.kinds:
+            text = format_event(event)
+            if self.prefix:
+                text = "\n".join(self.prefix + line for line in text.split("\n"))
+            print(text, file=self.out or sys.stdout)
+
+class JsonLinesRecorder:
+    """Writes one JSON object per event to a file or file-like object."""
+    active = True
+
+    def __init__(self, target):
+        if isinstance(target, str):
+            self.file = open(target, 'a')
+            self.owns_file = True
+        else:
+            self.file = target
+            self.owns_file = False
+
+    def emit(self, event):
+        record = event._asdict()
+        record['kind'] = event.kind
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+
+class EventLog:
+    """Keeps every event in order, for replaying a battle after it has been simulated."""
+    active = True
+
+    def __init__(self):
+        self.events = []
+        self.emit = self.events.append
+
+def event_from_record(record):
+    """Rebuilds an event from a JsonLinesRecorder record."""
+    cls = EVENT_TYPES[record['kind']]
+    values = [record[field] for field in cls._fields]
+    if cls is RoundEnd:
+        values[1] = tuple(tuple(unit) for unit in values[1])
+    return cls(*values)
+
+class CountingSink:
+    """Tallies events by kind and by (actor, kind) without keeping them."""
+    active = True
+
+    def __init__(self):
+        self.by_kind = Counter()
+        self.by_actor = Counter()
+
+    def emit(self, event):
+        self.by_kind[event.kind] += 1
+        actor = getattr(event, 'actor', None) or getattr(event, 'unit', None)
+        if actor:
+            self.by_actor[(actor, event.kind)] += 1
+
+NULL = NullSink()
+CONSOLE = ConsoleNarrator()
+
+# === Narration ===
+def format_event(event):
+    kind = event.kind
+    if kind == 'attack':
+        if event.hit:
+            return (f"  {event.actor} swings their weapon...\n"
+                    f"    ...solid hit! {event.target} takes {event.damage} physical damage. [HP: {event.hp}]")
+        return f"  {event.actor} swings their weapon...\n    ...misses!"
+    if kind == 'cast':
+        if event.effect == "damage":
+            return (f"{event.actor} casts {event.spell} ({event.channel}) on {event.target} for {event.roll} damage!\n"
+                    f"  {event.actor} casts {event.spell} for {event.damage} damage! [HP: {event.hp}]")
+        if event.effect == "heal":
+            return f"{event.actor} casts {event.spell} and heals {event.target} for {event.roll}!"
+        return f"{event.spell} has no recognized effect."
+    if kind == 'skill':
+        if event.effect == "damage":
+            return (f"{event.actor} uses {event.skill} on {event.target} for {event.roll} damage!\n"
+                    f"  {event.actor} uses {event.skill} for {event.damage} damage! [HP: {event.hp}]")
+        if event.effect == "buff":
+            return f"{event.actor} uses {event.skill} and gains +{event.modifier} {event.stat} for {event.duration} turns."
+        if event.effect == "debuff":
+            return f"{event.actor} uses {event.skill} on {event.target} reducing their {event.stat} by {abs(event.modifier)} for {event.duration} turns."
+        return f"{event.skill} has no recognized effect type."
+    if kind == 'turn':
+        return f"\n{event.actor} acts..." if event.first else f"\n{event.actor} responds..."
+    if kind == 'round_start':
+        return f"== ROUND {event.round} =="
+    if kind == 'round_end':
+        lines = ["\n--- STATUS ---"]
+        for name, hp, mana, stamina in event.units:
+            lines.append(f"{name}: HP {hp} | Mana {mana} | Stam {stamina}")
+        lines.append("---------------")
+        return "\n".join(lines)
+    if kind == 'battle_start':
+        return f"\n--- BATTLE BEGINS ---\n{event.unit1} vs {event.unit2}\n"
+    if kind == 'battle_end':
+        if event.winner is None:
+            detail = DRAW_REASONS.get(event.reason, "")
+            return f"\n*** BATTLE ENDS ***\n*** It's a draw{detail}! ***"
+        return f"\n*** BATTLE ENDS ***\n*** {event.winner} wins the battle! ***"
+    if kind == 'effect_applied':
+        return f"  [effect] {event.unit} gains {event.modifier:+} {event.stat} for {event.duration} turns"
+    if kind == 'effect_expired':
+        return f"  [effect] {event.modifier:+} {event.stat} on {event.unit} wears off"
+    if kind == 'regen':
+        return f"  [regen] {event.unit}: HP {event.hp} | Mana {event.mana} | Stam {event.stamina}"
+    return repr(event)
@@ -1,72 +1,156 @@
-import time
-from combat_state import CombatState
-from combat_core import resolve_action, apply_regen, process_effects, tick_cooldowns
-from derived_stats import calculate_derived_stats
+import random
+from combat_state import CombatState, Combatant
+from combat_core import resolve_action, take_action, apply_regen, process_effects, tick_cooldowns
+from combat_events import NULL, CONSOLE, BattleStart, RoundStart, Turn, Regen, RoundEnd, BattleEnd
 
-def apply_regen(derived):
-    derived['hp_current'] = min(derived['hp_total'], derived['hp_current'] + derived['hp_regen'])
-    derived['mana_current'] = min(derived['mana_total'], derived['mana_current'] + derived['mana_regen'])
-    derived['stamina_current'] = min(derived['stamina_total'], derived['stamina_current'] + derived['stamina_regen'])
+# Battles still going after this many rounds end in a draw
+MAX_ROUNDS = 1000
+# ...as do battles whose HP and pools haven't changed, with no effects
+# active, for this many consecutive rounds
+STALEMATE_WINDOW = 50
 
-def run_battle(unit1_data, unit2_data, slow_mode=False):
+def run_battle(unit1_data, unit2_data, quiet=False, sink=None, rng=random, timers=None,
+               max_rounds=MAX_ROUNDS, stalemate_window=STALEMATE_WINDOW):
+    """Runs a duel until a unit falls or it ends in a draw, and returns a summary of the outcome.
+
+    Narration goes to `sink` (see combat_events); by default that is the
+    console, or nothing at all with quiet=True. All dice come from `rng`;
+    pass a stream from rng_streams.battle_rng to make the battle replayable.
+    Pass a phase_timers.PhaseTimers as `timers` to time each round phase.
+    Battles always run at full speed; to watch one round by round, record
+    it into a combat_events.EventLog and replay that with battle_replay.
+    The battle is a draw once it reaches max_rounds, or after
+    stalemate_window rounds in a row that end with no effects active and
+    every HP and pool value unchanged.
+    """
+    if sink is None:
+        sink = NULL if quiet else CONSOLE
+    # Phase functions are bound once; timed wrappers only when asked for
+    act = resolve_action
+    refresh = Combatant.refresh_stats
+    tick_effects = process_effects
+    regen = apply_regen
+    cooldowns = tick_cooldowns
+    if timers is not None:
+        act = timed_action(timers)
+        refresh = timers.wrap("stats", refresh)
+        tick_effects = timers.wrap("effects", tick_effects)
+        regen = timers.wrap("regen", regen)
+        cooldowns = timers.wrap("cooldowns", cooldowns)
     state = CombatState(unit1_data, unit2_data)
+    unit1 = state.unit1
+    unit2 = state.unit2
     round_number = 1
+    end = "ko"
+    last_pools = None
+    unchanged = 0
+    unit1_actions = {'attack': 0, 'cast': 0, 'skill': 0}
+    unit2_actions = {'attack': 0, 'cast': 0, 'skill': 0}
 
-    print(f"\n--- BATTLE BEGINS ---")
-    print(f"{unit1_data['name']} vs {unit2_data['name']}\n")
+    if sink.active:
+        sink.emit(BattleStart(unit1.name, unit2.name))
 
     while True:
-        print(f"== ROUND {round_number} ==")
+        if sink.active:
+            sink.emit(RoundStart(round_number))
 
         # Unit 1 acts
-        print(f"\n{state.unit1['name']} acts...")
-        resolve_action(
-            state.unit1, state.unit2,
-            state.unit1_stats, state.unit2_stats,
-            state.unit1_effects, state.unit1_cooldowns
-        )
+        if sink.active:
+            sink.emit(Turn(unit1.name, True))
+        unit1_actions[act(unit1, unit2, sink, rng)] += 1
         if state.is_battle_over():
             break
-            
-            # Unit 2 acts
-        print(f"\n{state.unit2['name']} responds...")
-        resolve_action(
-            state.unit2, state.unit1,
-            state.unit2_stats, state.unit1_stats,
-            state.unit2_effects, state.unit2_cooldowns
-        )
+
+        # Unit 2 acts
+        if sink.active:
+            sink.emit(Turn(unit2.name, False))
+        unit2_actions[act(unit2, unit1, sink, rng)] += 1
         if state.is_battle_over():
             break
 
         # Process ongoing effects
-        process_effects(state.unit1_effects)
-        process_effects(state.unit2_effects)
+        tick_effects(unit1, sink)
+        tick_effects(unit2, sink)
 
         # Recalculate stats with preserved resources
-        state.unit1_stats = calculate_derived_stats(state.unit1, state.unit1_effects, state.unit1_stats)
-        state.unit2_stats = calculate_derived_stats(state.unit2, state.unit2_effects, state.unit2_stats)
+        refresh(unit1)
+        refresh(unit2)
 
         # Apply regen
-        apply_regen(state.unit1_stats)
-        apply_regen(state.unit2_stats)
+        regen(unit1)
+        regen(unit2)
 
         # Tick cooldowns
-        tick_cooldowns(state.unit1_cooldowns)
-        tick_cooldowns(state.unit2_cooldowns)
+        cooldowns(unit1)
+        cooldowns(unit2)
 
         # Status update
-        print("\n--- STATUS ---")
-        print(f"{state.unit1['name']}: HP {state.unit1_stats['hp_current']} | Mana {state.unit1_stats['mana_current']} | Stam {state.unit1_stats['stamina_current']}")
-        print(f"{state.unit2['name']}: HP {state.unit2_stats['hp_current']} | Mana {state.unit2_stats['mana_current']} | Stam {state.unit2_stats['stamina_current']}")
-        print("---------------")
+        if sink.active:
+            sink.emit(Regen(*unit1.status()))
+            sink.emit(Regen(*unit2.status()))
+            sink.emit(RoundEnd(round_number, (unit1.status(), unit2.status())))
+
+        if unit1.effects or unit2.effects:
+            last_pools = None
+            unchanged = 0
+        else:
+            pools = (unit1.hp_current, unit1.mana_current, unit1.stamina_current,
+                     unit2.hp_current, unit2.mana_current, unit2.stamina_current)
+            unchanged = unchanged + 1 if pools == last_pools else 0
+            last_pools = pools
+            if unchanged >= stalemate_window:
+                end = "stalemate"
+                break
+        if round_number >= max_rounds:
+            end = "round_cap"
+            break
 
         round_number += 1
-        if slow_mode:
-            time.sleep(4)
-            
-            print("\n*** BATTLE ENDS ***")
-    if state.unit1_stats['hp_current'] <= 0 and state.unit2_stats['hp_current'] <= 0:
-        print("*** It's a draw! ***")
+
+    if end != "ko" or (unit1.hp_current <= 0 and unit2.hp_current <= 0):
+        side = None
     else:
-        winner = state.unit1 if state.unit2_stats['hp_current'] <= 0 else state.unit2
-        print(f"*** {winner['name']} wins the battle! ***")
\ No newline at end of file
+        side = 1 if unit2.hp_current <= 0 else 2
+
+    result = battle_result(state, side, round_number, unit1_actions, unit2_actions, end)
+    if sink.active:
+        sink.emit(BattleEnd(result['winner'], round_number, end))
+    return result
+
+def side_summary(combatant, actions):
+    return {
+        'name': combatant.name,
+        'hp': combatant.hp_current,
+        'mana': combatant.mana_current,
+        'stamina': combatant.stamina_current,
+        'actions': actions,
+    }
+
+def timed_action(timers):
+    """resolve_action with its stat refreshes timed under "stats" and the rest under "action"."""
+    refresh = timers.wrap("stats", Combatant.refresh_stats)
+    take = timers.wrap("action", take_action)
+
+    def act(actor, target, sink, rng):
+        refresh(actor)
+        refresh(target, False)
+        return take(actor, target, sink, rng)
+    return act
+
+def battle_result(state, side, rounds, unit1_actions, unit2_actions, end="ko"):
+    """Builds the structured result returned by run_battle.
+
+    'side' is 1 or 2 for the winning unit, None for a draw; 'end' says how
+    the battle ended: 'ko', 'round_cap' or 'stalemate'. Units are reported
+    by side rather than by name so mirror matches stay unambiguous.
+    """
+    unit1 = side_summary(state.unit1, unit1_actions)
+    unit2 = side_summary(state.unit2, unit2_actions)
+    return {
+        'winner': (unit1 if side == 1 else unit2)['name'] if side else None,
+        'side': side,
+        'rounds': rounds,
+        'end': end,
+        'unit1': unit1,
+        'unit2': unit2,
+    }
@@ -1,15 +1,77 @@
-from derived_stats import calculate_derived_stats
+from abilities import compile_abilities
+from derived_stats import derive
+from resistances import resistance_table
+from status_engine import EffectStore
+
+# Position of each attribute in attribute tuples, in derive() argument order
+STAT_INDEX = {'str': 0, 'dex': 1, 'con': 2, 'int': 3, 'wis': 4}
+
+class Combatant:
+    """Everything about one unit that changes during a battle.
+
+    Base attributes, derived stats, current pools, effects and cooldowns live
+    in slots and are updated in place by combat_core, instead of being
+    rebuilt as fresh dicts every round. Effects live in a
+    status_engine.EffectStore, which keeps the running per-attribute
+    modifier sums that refresh_stats reads.
+    """
+    __slots__ = (
+        'unit', 'name', 'resistances', 'resistance_table',
+        'base_str', 'base_dex', 'base_con', 'base_int', 'base_wis',
+        'hitroll', 'damroll', 'ac',
+        'hp_total', 'mana_total', 'stamina_total',
+        'hp_regen', 'mana_regen', 'stamina_regen',
+        'hp_current', 'mana_current', 'stamina_current',
+        'abilities', 'effects', 'spell_cooldown', 'skill_cooldown',
+    )
+
+    def __init__(self, unit):
+        stats = unit.get("stats", {})
+        self.unit = unit
+        self.name = unit['name']
+        self.resistances = unit.get("resistances", {})
+        self.resistance_table = resistance_table(unit)
+        self.base_str = stats.get('str', 10)
+        self.base_dex = stats.get('dex', 10)
+        self.base_con = stats.get('con', 10)
+        self.base_int = stats.get('int', 10)
+        self.base_wis = stats.get('wis', 10)
+        self.abilities = compile_abilities(unit)
+        self.effects = EffectStore()
+        self.spell_cooldown = 0
+        self.skill_cooldown = 0
+        self.refresh_stats(with_effects=False)
+        self.hp_current = self.hp_total
+        self.mana_current = self.mana_total
+        self.stamina_current = self.stamina_total
+
+    def refresh_stats(self, with_effects=True):
+        """Recomputes derived stats in place; current pools are left alone."""
+        if with_effects:
+            mods = self.effects.sums
+            derived = derive(self.base_str + mods.get('str', 0), self.base_dex + mods.get('dex', 0),
+                             self.base_con + mods.get('con', 0), self.base_int + mods.get('int', 0),
+                             self.base_wis + mods.get('wis', 0))
+        else:
+            derived = derive(self.base_str, self.base_dex, self.base_con, self.base_int, self.base_wis)
+        (self.hitroll, self.damroll, self.ac,
+         self.hp_total, self.mana_total, self.stamina_total,
+         self.hp_regen, self.mana_regen, self.stamina_regen) = derived
+
+    def add_effect(self, effect):
+        self.effects.add(effect)
+
+    def remove_effect(self, effect):
+        self.effects.remove(effect)
+
+    def status(self):
+        """(name, hp, mana, stamina) as reported in round-end events."""
+        return (self.name, self.hp_current, self.mana_current, self.stamina_current)
 
 class CombatState:
     def __init__(self, unit1, unit2):
-        self.unit1 = unit1
-        self.unit2 = unit2
-        self.unit1_stats = calculate_derived_stats(unit1)
-        self.unit2_stats = calculate_derived_stats(unit2)
-        self.unit1_effects = []
-        self.unit2_effects = []
-        self.unit1_cooldowns = {'spell_cooldown': 0, 'skill_cooldown': 0}
-        self.unit2_cooldowns = {'spell_cooldown': 0, 'skill_cooldown': 0}
+        self.unit1 = Combatant(unit1)
+        self.unit2 = Combatant(unit2)
 
     def is_battle_over(self):
-        return self.unit1_stats['hp_current'] <= 0 or self.unit2_stats['hp_current'] <= 0
\ No newline at end of file
+        return self.unit1.hp_current <= 0 or self.unit2.hp_current <= 0
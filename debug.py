@@ -1,9 +1,8 @@
 # debug.py
 
-# Toggle these flags to enable or disable debug printouts in various systems
+# Toggle these flags to add extra event kinds to the console narrator
+# (combat_events.ConsoleNarrator). Recorders and counters always receive
+# every event regardless of these settings.
 
-DEBUG_ACTIONS = False         # Logs action selection (spells, skills, fallback attacks)
-DEBUG_EFFECTS = False         # Logs when effects are applied, ticked, or expire
-DEBUG_STATS = False           # Logs recalculated derived stats each turn
-DEBUG_COOLDOWNS = False      # Logs spell/skill cooldown states
-DEBUG_COMBAT_FLOW = False    # Logs turn-by-turn flow markers
\ No newline at end of file
+DEBUG_EFFECTS = False         # Logs when effects are applied or expire
+DEBUG_STATS = False           # Logs pools after end-of-round regen
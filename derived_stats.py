@@ -1,3 +1,38 @@
+from functools import lru_cache
+
+from status_engine import EffectStore
+
+# Upper bound on distinct attribute sets kept by derive()'s cache
+DERIVE_CACHE_SIZE = 4096
+
+# Order of the values returned by derive()
+DERIVED_FIELDS = (
+    'hitroll', 'damroll', 'ac',
+    'hp_total', 'mana_total', 'stamina_total',
+    'hp_regen', 'mana_regen', 'stamina_regen',
+)
+
+@lru_cache(maxsize=DERIVE_CACHE_SIZE)
+def derive(str_, dex, con, int_, wis):
+    """Derived values for one set of effective attributes, in DERIVED_FIELDS order.
+
+    Derived stats depend only on a unit's base attributes plus the summed
+    modifiers of its active effects, i.e. on these five numbers, so results
+    are memoized on them with LRU eviction. Units or effect combinations that
+    land on the same attributes share one entry.
+    """
+    return (
+        dex // 2,                     # hitroll
+        str_ // 3,                    # damroll
+        10 + dex // 4,                # ac
+        con * 5,                      # hp_total
+        (int_ + wis) * 5,             # mana_total
+        (str_ + dex + con) * 3,       # stamina_total
+        con // 8,                     # hp_regen
+        (int_ + wis) // 8,            # mana_regen
+        (str_ + con) // 8,            # stamina_regen
+    )
+
 def calculate_derived_stats(unit_data, active_effects=None, previous=None):
     stats = unit_data.get("stats", {})
     base_str = stats.get('str', 10)
@@ -7,7 +42,13 @@ def calculate_derived_stats(unit_data, active_effects=None, previous=None):
     base_wis = stats.get('wis', 10)
 
     # Apply active effects if any
-    if active_effects:
+    if isinstance(active_effects, EffectStore):
+        base_str += active_effects.modifier('str')
+        base_dex += active_effects.modifier('dex')
+        base_con += active_effects.modifier('con')
+        base_int += active_effects.modifier('int')
+        base_wis += active_effects.modifier('wis')
+    elif active_effects:
         for effect in active_effects:
             if effect.get('stat') == 'str':
                 base_str += effect.get('modifier', 0)
@@ -20,43 +61,20 @@ def calculate_derived_stats(unit_data, active_effects=None, previous=None):
             elif effect.get('stat') == 'wis':
                 base_wis += effect.get('modifier', 0)
 
-    # Derived calculations
-    hitroll = base_dex // 2
-    damroll = base_str // 3
-    ac = 10 + base_dex // 4
-    hp_total = base_con * 5
-    mana_total = (base_int + base_wis) * 5
-    stamina_total = (base_str + base_dex + base_con) * 3
-
-    # Regen
-    hp_regen = base_con // 8
-    mana_regen = (base_int + base_wis) // 8
-    stamina_regen = (base_str + base_con) // 8
+    # Derived calculations, regen included
+    derived = dict(zip(DERIVED_FIELDS, derive(base_str, base_dex, base_con, base_int, base_wis)))
 
     # Resistances
-    resistances = unit_data.get("resistances", {})
-
-    derived = {
-        'hitroll': hitroll,
-        'damroll': damroll,
-        'ac': ac,
-        'hp_total': hp_total,
-        'mana_total': mana_total,
-        'stamina_total': stamina_total,
-        'hp_regen': hp_regen,
-        'mana_regen': mana_regen,
-        'stamina_regen': stamina_regen,
-        'resistances': resistances,
-    }
+    derived['resistances'] = unit_data.get("resistances", {})
 
     # Preserve current values if previous stats exist
     if previous:
-        derived['hp_current'] = previous.get('hp_current', hp_total)
-        derived['mana_current'] = previous.get('mana_current', mana_total)
-        derived['stamina_current'] = previous.get('stamina_current', stamina_total)
+        derived['hp_current'] = previous.get('hp_current', derived['hp_total'])
+        derived['mana_current'] = previous.get('mana_current', derived['mana_total'])
+        derived['stamina_current'] = previous.get('stamina_current', derived['stamina_total'])
     else:
-        derived['hp_current'] = hp_total
-        derived['mana_current'] = mana_total
-        derived['stamina_current'] = stamina_total
+        derived['hp_current'] = derived['hp_total']
+        derived['mana_current'] = derived['mana_total']
+        derived['stamina_current'] = derived['stamina_total']
 
-    return derived
\ No newline at end of file
+    return derived
@@ -0,0 +1,375 @@
+# duel_solver.py
+#
+# Exact outcome probabilities for duels, without sampling. The battle is a
+# Markov chain. Everything except HP (mana, stamina, cooldowns and effect
+# timers) evolves deterministically under the combat_core rules, because
+# action selection never looks at HP and only HP changes are random. So the
+# state is kept as groups: each distinct non-HP state maps to an array with
+# the probability of every (hp1, hp2) pair still in play. Each action moves a
+# group's mass along one unit's HP axis by a transition matrix; mass that
+# drops a unit to 0 HP is collected as a win for the other side in that
+# round. Groups that reach the same non-HP state are merged. The rules are
+# the same as combat_loop.run_battle, including its draws: mass still alive
+# at the round cap is a draw, and so is mass in a round that changes nothing
+# at all (no kills, no effects, the same states and HP distribution), which
+# run_battle would call a stalemate once its window runs out.
+import argparse
+from functools import lru_cache
+
+import numpy as np
+
+import unit_loader
+from abilities import compile_abilities
+from resistances import resistance_table, resisted
+from combat_loop import MAX_ROUNDS, STALEMATE_WINDOW
+from combat_state import STAT_INDEX
+from derived_stats import derive
+
+DEFAULT_MAX_ROUNDS = MAX_ROUNDS
+# Stop once this little probability is left undecided
+DEFAULT_TOLERANCE = 1e-12
+# HP states less likely than this are dropped (and reported as discarded)
+DEFAULT_EPSILON = 1e-15
+
+def base_stats(unit):
+    """Derived stats of an unbuffed unit, in derived_stats.DERIVED_FIELDS order."""
+    stats = unit.get("stats", {})
+    return derive(stats.get('str', 10), stats.get('dex', 10), stats.get('con', 10),
+                  stats.get('int', 10), stats.get('wis', 10))
+
+def is_melee_only(unit):
+    """True if the unit never casts or uses a skill, so it only ever attacks."""
+    return not compile_abilities(unit)
+
+def attack_damage(hitroll, damroll, ac):
+    """Damage of one fallback_attack as ((amount, probability), ...); a miss is 0 damage."""
+    # d20 + hitroll >= ac
+    hit = max(0, min(20, 21 - ac + hitroll)) / 20
+    outcomes = {amount + damroll: hit / 4 for amount in range(1, 5)}
+    outcomes[0] = outcomes.get(0, 0) + 1 - hit
+    return tuple(sorted(outcomes.items()))
+
+@lru_cache(maxsize=None)
+def hit_matrix(size, damage):
+    """Transition over one unit's HP (0..size-1) for a damage distribution.
+
+    Returns (moves, deaths): moves[h, h2] is the probability of going from
+    h to h2 HP and deaths[h] the probability of dropping to 0 or below.
+    Row 0 stays empty; that HP is never in play.
+    """
+    moves = np.zeros((size, size))
+    deaths = np.zeros(size)
+    for h in range(1, size):
+        for amount, p in damage:
+            if h - amount > 0:
+                moves[h, h - amount] += p
+            else:
+                deaths[h] += p
+    return moves, deaths
+
+@lru_cache(maxsize=None)
+def regen_matrix(size, total, regen):
+    """Transition over one unit's HP for end-of-round regen, min(total, hp + regen)."""
+    moves = np.zeros((size, size))
+    for h in range(1, size):
+        moves[h, max(1, min(total, h + regen))] = 1
+    return moves
+
+def strike(dist, axis, damage):
+    """Applies one attack's damage to the unit on `axis` of dist.
+
+    Returns (new dist, probability that the attack killed the unit).
+    """
+    moves, deaths = hit_matrix(dist.shape[axis], damage)
+    if axis == 0:
+        return moves.T @ dist, float(deaths @ dist.sum(axis=1))
+    return dist @ moves, float(dist.sum(axis=0) @ deaths)
+
+def regenerate(dist, axis, total, regen):
+    moves = regen_matrix(dist.shape[axis], total, regen)
+    if axis == 0:
+        return moves.T @ dist
+    return dist @ moves
+
+def new_outcome():
+    return {'unit1_win_rate': 0.0, 'unit2_win_rate': 0.0, 'draw_rate': 0.0, 'unresolved': 0.0,
+            'rounds_histogram': [0.0]}
+
+def record_draws(outcome, round_number, mass):
+    histogram = outcome['rounds_histogram']
+    histogram.extend([0.0] * (round_number + 1 - len(histogram)))
+    histogram[round_number] += mass
+    outcome['draw_rate'] += mass
+
+def stalemate_round(round_number, max_rounds, stalemate_window):
+    """Round in which run_battle calls a draw for a battle that stopped changing in round_number.
+
+    Only rounds after the first count; run_battle has no earlier round to
+    compare the first one with.
+    """
+    return min(max_rounds, round_number + stalemate_window - 1)
+
+def finish_outcome(outcome, remaining):
+    """Fills in the undecided mass and the mean battle length."""
+    outcome['unresolved'] += remaining
+    histogram = outcome['rounds_histogram']
+    decided = sum(histogram)
+    outcome['mean_rounds'] = sum(r * p for r, p in enumerate(histogram)) / decided if decided else 0.0
+    return outcome
+
+def solve_melee(unit1_data, unit2_data, max_rounds=DEFAULT_MAX_ROUNDS, tolerance=DEFAULT_TOLERANCE,
+                stalemate_window=STALEMATE_WINDOW):
+    """Exact outcome of a duel between two units that can only attack.
+
+    Returns the win and draw probabilities, the probability of the battle
+    ending in each round ('rounds_histogram', indexed by round), the mean
+    length, and 'unresolved': mass left undecided once it fell below
+    tolerance.
+    """
+    if not (is_melee_only(unit1_data) and is_melee_only(unit2_data)):
+        raise ValueError("solve_melee only handles units without spells or skills")
+    hitroll1, damroll1, ac1, hp1, _, _, regen1, _, _ = base_stats(unit1_data)
+    hitroll2, damroll2, ac2, hp2, _, _, regen2, _, _ = base_stats(unit2_data)
+    damage1 = attack_damage(hitroll1, damroll1, ac2)
+    damage2 = attack_damage(hitroll2, damroll2, ac1)
+
+    dist = np.zeros((hp1 + 1, hp2 + 1))
+    dist[hp1, hp2] = 1.0
+    outcome = new_outcome()
+    remaining = 1.0
+    round_number = 1
+    while remaining > tolerance:
+        previous = dist
+        dist, won1 = strike(dist, 1, damage1)
+        dist, won2 = strike(dist, 0, damage2)
+        dist = regenerate(regenerate(dist, 0, hp1, regen1), 1, hp2, regen2)
+        outcome['unit1_win_rate'] += won1
+        outcome['unit2_win_rate'] += won2
+        outcome['rounds_histogram'].append(won1 + won2)
+        remaining = float(dist.sum())
+        if remaining > tolerance and round_number > 1 and not won1 + won2 and np.array_equal(dist, previous):
+            record_draws(outcome, stalemate_round(round_number, max_rounds, stalemate_window), remaining)
+            remaining = 0.0
+        elif round_number >= max_rounds:
+            record_draws(outcome, round_number, remaining)
+            remaining = 0.0
+        round_number += 1
+    return finish_outcome(outcome, remaining)
+
+# === Full rule set ===
+# A side's non-HP state is (mana, stamina, spell_cooldown, skill_cooldown,
+# effects), where effects is a sorted tuple of (stat index, modifier, turns
+# left). Effects that can never change a stat are left out, so battles that
+# differ only in those merge into one state.
+
+class SideRules:
+    """The fixed rule data one unit brings to a duel against a given opponent."""
+
+    def __init__(self, unit, opponent):
+        stats = unit.get("stats", {})
+        self.base = tuple(stats.get(stat, 10) for stat in STAT_INDEX)
+        self.ac = base_stats(unit)[2]
+        # (kind, cost, cooldown, damage distribution or None, effect or None)
+        # in the order choose_resolved_action tries them
+        self.abilities = []
+        for ability in compile_abilities(unit):
+            lo, hi = ability.magnitude
+            damage = effect = None
+            if ability.kind == "spell":
+                if ability.effect == "damage":
+                    table = resistance_table(opponent)
+                    amounts = [resisted(table, amount, ability.channel_index) for amount in range(lo, hi + 1)]
+                    damage = uniform(amounts)
+            elif ability.effect == "damage":
+                damage = uniform(range(lo, hi + 1))
+            elif ability.effect in ("buff", "debuff"):
+                # An effect lasting one turn or less expires before it is ever read
+                if ability.stat in STAT_INDEX and ability.modifier and (ability.duration or 0) > 1:
+                    effect = (STAT_INDEX[ability.stat], ability.modifier, ability.duration)
+            self.abilities.append((ability.kind, ability.cost, ability.cooldown, damage, effect))
+        # Memoized transitions; every battle in a group follows the same path
+        self._actions = {}
+        self._round_ends = {}
+
+    def initial(self):
+        _, _, _, _, mana, stamina, _, _, _ = derive(*self.base)
+        return (mana, stamina, 0, 0, ())
+
+    def derived(self, effects):
+        stats = list(self.base)
+        for index, modifier, _ in effects:
+            stats[index] += modifier
+        return derive(*stats)
+
+    def act(self, state, target_ac):
+        """What the unit does from `state`, like combat_core.resolve_action.
+
+        Returns (state afterwards, damage distribution dealt or None).
+        """
+        key = (state, target_ac)
+        if key not in self._actions:
+            self._actions[key] = self._act(state, target_ac)
+        return self._actions[key]
+
+    def _act(self, state, target_ac):
+        mana, stamina, spell_cooldown, skill_cooldown, effects = state
+        for kind, cost, cooldown, damage, effect in self.abilities:
+            if kind == "spell":
+                if spell_cooldown <= 0 and cost <= mana:
+                    return (mana - cost, stamina, cooldown, skill_cooldown, effects), damage
+            elif skill_cooldown <= 0 and cost <= stamina:
+                if effect:
+                    effects = tuple(sorted(effects + (effect,)))
+                return (mana, stamina - cost, spell_cooldown, cooldown, effects), damage
+        hitroll, damroll = self.derived(effects)[:2]
+        return state, attack_damage(hitroll, damroll, target_ac)
+
+    def end_round(self, state):
+        """Effect ticks, regen and cooldown ticks, like the end of a run_battle round.
+
+        Returns (state afterwards, hp_total, hp_regen) for regenerating HP.
+        """
+        if state not in self._round_ends:
+            self._round_ends[state] = self._end_round(state)
+        return self._round_ends[state]
+
+    def _end_round(self, state):
+        mana, stamina, spell_cooldown, skill_cooldown, effects = state
+        effects = tuple((index, modifier, left - 1) for index, modifier, left in effects if left > 1)
+        _, _, _, hp_total, mana_total, stamina_total, hp_regen, mana_regen, stamina_regen = self.derived(effects)
+        state = (min(mana_total, mana + mana_regen), min(stamina_total, stamina + stamina_regen),
+                 spell_cooldown - 1 if spell_cooldown > 0 else spell_cooldown,
+                 skill_cooldown - 1 if skill_cooldown > 0 else skill_cooldown,
+                 effects)
+        return state, hp_total, hp_regen
+
+def uniform(amounts):
+    """Distribution ((amount, probability), ...) of a uniformly chosen entry of amounts."""
+    amounts = list(amounts)
+    outcomes = {}
+    for amount in amounts:
+        outcomes[amount] = outcomes.get(amount, 0) + 1 / len(amounts)
+    return tuple(sorted(outcomes.items()))
+
+def fit(dist, shape):
+    """dist zero-padded up to at least `shape`."""
+    padding = [(0, max(0, size - have)) for size, have in zip(shape, dist.shape)]
+    if any(extra for _, extra in padding):
+        return np.pad(dist, padding)
+    return dist
+
+def merge(groups, state, dist):
+    if state in groups:
+        current = groups[state]
+        shape = tuple(max(a, b) for a, b in zip(current.shape, dist.shape))
+        groups[state] = fit(current, shape) + fit(dist, shape)
+    else:
+        groups[state] = dist
+
+def solve(unit1_data, unit2_data, max_rounds=DEFAULT_MAX_ROUNDS, tolerance=DEFAULT_TOLERANCE,
+          epsilon=DEFAULT_EPSILON, stalemate_window=STALEMATE_WINDOW):
+    """Outcome of any duel under the full rule set: spells, skills, cooldowns and effects.
+
+    Returns the same fields as solve_melee, plus 'discarded': the total
+    probability of HP states dropped for being below epsilon (0 when
+    epsilon is 0, which keeps the result exact), and 'peak_states': the most
+    distinct non-HP states alive at once.
+    """
+    rules1 = SideRules(unit1_data, unit2_data)
+    rules2 = SideRules(unit2_data, unit1_data)
+    hp1 = base_stats(unit1_data)[3]
+    hp2 = base_stats(unit2_data)[3]
+    dist = np.zeros((hp1 + 1, hp2 + 1))
+    dist[hp1, hp2] = 1.0
+    groups = {(rules1.initial(), rules2.initial()): dist}
+    outcome = new_outcome()
+    outcome['discarded'] = 0.0
+    outcome['peak_states'] = 1
+    remaining = 1.0
+    round_number = 1
+
+    while remaining > tolerance:
+        previous = groups
+        won1 = won2 = 0.0
+        acted = {}
+        for (state1, state2), dist in groups.items():
+            state1, damage = rules1.act(state1, rules2.ac)
+            if damage is not None:
+                dist, killed = strike(dist, 1, damage)
+                won1 += killed
+            merge(acted, (state1, state2), dist)
+        groups = {}
+        for (state1, state2), dist in acted.items():
+            state2, damage = rules2.act(state2, rules1.ac)
+            if damage is not None:
+                dist, killed = strike(dist, 0, damage)
+                won2 += killed
+            merge(groups, (state1, state2), dist)
+
+        acted = {}
+        for (state1, state2), dist in groups.items():
+            state1, total1, regen1 = rules1.end_round(state1)
+            state2, total2, regen2 = rules2.end_round(state2)
+            dist = fit(dist, (total1 + 1, total2 + 1))
+            dist = regenerate(regenerate(dist, 0, total1, regen1), 1, total2, regen2)
+            if epsilon:
+                dropped = dist < epsilon
+                outcome['discarded'] += float(dist[dropped].sum())
+                dist[dropped] = 0.0
+            if dist.any():
+                merge(acted, (state1, state2), dist)
+        groups = acted
+
+        outcome['unit1_win_rate'] += won1
+        outcome['unit2_win_rate'] += won2
+        outcome['rounds_histogram'].append(won1 + won2)
+        outcome['peak_states'] = max(outcome['peak_states'], len(groups))
+        remaining = sum(float(dist.sum()) for dist in groups.values())
+        if remaining > tolerance and round_number > 1 and not won1 + won2 and unchanged(previous, groups):
+            record_draws(outcome, stalemate_round(round_number, max_rounds, stalemate_window), remaining)
+            remaining = 0.0
+        elif round_number >= max_rounds:
+            record_draws(outcome, round_number, remaining)
+            remaining = 0.0
+        round_number += 1
+    return finish_outcome(outcome, remaining)
+
+def unchanged(previous, groups):
+    """True if a round left every state, and its HP distribution, exactly as it was, with no effects active."""
+    if previous.keys() != groups.keys():
+        return False
+    for (state1, state2), dist in groups.items():
+        if state1[4] or state2[4] or not np.array_equal(previous[(state1, state2)], dist):
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact win probabilities for a duel, without sampling.")
+    parser.add_argument("unit1")
+    parser.add_argument("unit2")
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON,
+                        help="drop HP states less likely than this (0 keeps the result exact)")
+    args = parser.parse_args()
+
+    unit1 = unit_loader.load_unit(args.unit1)
+    unit2 = unit_loader.load_unit(args.unit2)
+    if not unit1 or not unit2:
+        return
+    if is_melee_only(unit1) and is_melee_only(unit2):
+        outcome = solve_melee(unit1, unit2, args.max_rounds)
+    else:
+        outcome = solve(unit1, unit2, args.max_rounds, epsilon=args.epsilon)
+    print(f"{unit1['name']} vs {unit2['name']} (solved, no sampling)")
+    print(f"  {unit1['name']} wins: {outcome['unit1_win_rate']:.4%}")
+    print(f"  {unit2['name']} wins: {outcome['unit2_win_rate']:.4%}")
+    if outcome['draw_rate']:
+        print(f"  Draws: {outcome['draw_rate']:.4%}")
+    print(f"  Average length: {outcome['mean_rounds']:.3f} rounds")
+    if outcome['unresolved']:
+        print(f"  Undecided: {outcome['unresolved']:.2e}")
+    if outcome.get('discarded'):
+        print(f"  Discarded below epsilon: {outcome['discarded']:.2e}")
+
+if __name__ == "__main__":
+    main()
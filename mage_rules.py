@@ -3,29 +3,42 @@ import os
 import random
 
 SPELLS_FILE = os.path.join(os.path.dirname(__file__), "spells.json")
-with open(SPELLS_FILE, "r") as f:
-    SPELL_DATA = json.load(f)
+
+def spell_data():
+    """spells.json, parsed on first use rather than at import."""
+    global SPELL_DATA
+    try:
+        return SPELL_DATA
+    except NameError:
+        with open(SPELLS_FILE, "r") as f:
+            SPELL_DATA = json.load(f)
+        return SPELL_DATA
+
+def __getattr__(name):
+    # Keeps `mage_rules.SPELL_DATA` working before anything has loaded it
+    if name == "SPELL_DATA":
+        return spell_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_spell_cost(caster_data, spell_name):
-    if "can_cast" in caster_data['tags'] and spell_name in SPELL_DATA:
-        return SPELL_DATA[spell_name]["cost"]
+    spells = spell_data()
+    if "can_cast" in caster_data['tags'] and spell_name in spells:
+        return spells[spell_name]["cost"]
     return None
 
 def get_spell_cooldown(spell_name):
-    return SPELL_DATA.get(spell_name, {}).get("cooldown", 0)
+    return spell_data().get(spell_name, {}).get("cooldown", 0)
 
-def cast_spell(caster_data, target_data, spell_name):
-    spell = SPELL_DATA.get(spell_name)
+def cast_spell(caster_data, target_data, spell_name, rng=random):
+    spell = spell_data().get(spell_name)
     if not spell:
-        print(f"Unknown spell: {spell_name}")
         return None
 
     magnitude = spell.get("magnitude", [0, 0])
-    amount = random.randint(*magnitude)
+    amount = rng.randint(*magnitude)
 
     if spell["effect"] == "damage":
         channel = spell.get("channel", "generic")
-        print(f"{caster_data['name']} casts {spell_name} ({channel}) on {target_data['name']} for {amount} damage!")
         return {
             "amount": amount,
             "channel": channel,
@@ -33,7 +46,6 @@ def cast_spell(caster_data, target_data, spell_name):
         }
 
     elif spell["effect"] == "heal":
-        print(f"{caster_data['name']} casts {spell_name} and heals {target_data['name']} for {amount}!")
         return {
             "amount": -amount,
             "channel": "healing",
@@ -41,5 +53,4 @@ def cast_spell(caster_data, target_data, spell_name):
         }
 
     else:
-        print(f"{spell_name} has no recognized effect.")
         return None
\ No newline at end of file
@@ -1,46 +1,69 @@
 # main.py
-import subprocess
-import platform
+#
+# Menu for the interactive tools. Tools run in this process: each tool's
+# module is imported on first use and its main() called, so launching one
+# costs an import instead of a fresh interpreter. Run with --timing to print
+# how long each launch took to reach the tool.
+import argparse
+import importlib
+import os
+import sys
+import time
+
+# Menu choice -> (title, module with a main())
+TOOLS = {
+    '1': ("Unit Editor", "unit_editor.editor"),
+    '2': ("Army Drafter", "army_drafting.drafter"),
+}
 
 def clear_screen():
-    """Clears the terminal screen."""
-    if platform.system() == "Windows":
-        subprocess.run("cls", check=True)
-    else:
-        subprocess.run("clear", shell=True, check=True)
+    """Clears the terminal screen with ANSI escapes (no shell round trip)."""
+    if sys.stdout.isatty():
+        print("\033[2J\033[H", end="", flush=True)
+
+def launch(module_name, timing=False):
+    """Imports a tool (once) and runs its main(); returns seconds from launch to the tool starting."""
+    start = time.perf_counter()
+    tool = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    if timing:
+        print(f"[ready in {elapsed * 1000:.1f} ms]")
+    tool.main()
+    return elapsed
 
-def main_menu():
+def main_menu(timing=False):
     """Displays the main menu and handles user selection."""
     while True:
         clear_screen()
         print("--- Main Menu ---")
-        print("1. Unit Editor")
-        print("2. Army Drafter")
-        print("3. Exit")
+        for choice, (title, _) in TOOLS.items():
+            print(f"{choice}. {title}")
+        print(f"{len(TOOLS) + 1}. Exit")
 
         choice = input("Enter your choice: ")
 
-        if choice == '1':
-            print("\nLaunching Unit Editor...")
+        if choice in TOOLS:
+            title, module_name = TOOLS[choice]
+            print(f"\nLaunching {title}...")
             try:
-                subprocess.run(["python", "unit_editor/editor.py"], check=True)
-            except FileNotFoundError:
-                print("Error: 'unit_editor/editor.py' not found.")
-            except subprocess.CalledProcessError as e:
-                print(f"Error running Unit Editor: {e}")
-        elif choice == '2':
-            print("\nLaunching Army Drafter...")
-            try:
-                subprocess.run(["python", "army_drafting/drafter.py"], check=True)
-            except FileNotFoundError:
-                print("Error: 'army_drafting/drafter.py' not found.")
-            except subprocess.CalledProcessError as e:
-                print(f"Error running Army Drafter: {e}")
-        elif choice == '3':
+                launch(module_name, timing)
+            except ImportError as e:
+                print(f"Error loading {title}: {e}")
+            except Exception as e:
+                print(f"Error running {title}: {e}")
+        elif choice == str(len(TOOLS) + 1):
             print("Exiting.")
             break
         else:
             print("Invalid choice. Please try again.")
 
+def main():
+    parser = argparse.ArgumentParser(description="Main menu for the unit editor and army drafter.")
+    parser.add_argument("--timing", action="store_true", help="print how long each tool took to launch")
+    args = parser.parse_args()
+    # Tools live in subfolders and are imported as modules from the repo root
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main_menu(args.timing)
+
 if __name__ == "__main__":
-    main_menu()
+    main()
@@ -0,0 +1,171 @@
+# matchup_cache.py
+#
+# On-disk store of aggregated matchup results, so analyses only simulate
+# pairs whose inputs changed. An entry is keyed by a hash of everything that
+# can affect a battle: both units' JSON (minus fields combat never reads),
+# the spells.json/skills.json entries their tags reference, and
+# combat_core.ENGINE_VERSION. Editing a unit, a spell it uses or the rules
+# therefore misses the cache instead of returning stale numbers.
+#
+# The store is a SQLite database in WAL mode. Read-modify-write updates run
+# in IMMEDIATE transactions, so several tournament or pricing processes can
+# share one cache file safely. The least recently used entries are evicted
+# once the cache holds more than max_entries.
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import mage_rules
+import warrior_rules
+from combat_core import ENGINE_VERSION
+from unit_registry import thaw
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(SCRIPT_DIR, "matchup_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 200000
+# Unit fields that never influence a battle; changing them keeps cached results
+NON_COMBAT_FIELDS = ("description", "cost")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matchups (
+    key TEXT PRIMARY KEY,
+    seed INTEGER NOT NULL,
+    wins_first INTEGER NOT NULL,
+    wins_second INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    rounds TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matchups_last_used ON matchups (last_used);
+"""
+
+def unit_fingerprint(unit):
+    """Hash of everything about a unit that can change how its battles go."""
+    data = {key: value for key, value in thaw(unit).items() if key not in NON_COMBAT_FIELDS}
+    referenced = {}
+    for tag in data.get('tags', ()):
+        if tag.startswith("spell_"):
+            referenced[tag] = mage_rules.SPELL_DATA.get(tag[6:])
+        elif tag.startswith("skill_"):
+            referenced[tag] = warrior_rules.SKILL_DATA.get(tag[6:])
+    payload = json.dumps({'unit': data, 'abilities': referenced}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def matchup_key(fingerprint_a, fingerprint_b):
+    """(key, flipped) for a pairing; flipped is True if unit_b is stored as the first unit.
+
+    A pairing and its reverse share one entry.
+    """
+    first, second = fingerprint_a, fingerprint_b
+    flipped = second < first
+    if flipped:
+        first, second = second, first
+    key = hashlib.sha256(f"{ENGINE_VERSION}:{first}:{second}".encode()).hexdigest()
+    return key, flipped
+
+class MatchupCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def get(self, fingerprint_a, fingerprint_b):
+        """Cached totals for unit a vs unit b (by unit_fingerprint), from a's point of view.
+
+        Returns None on a miss, otherwise a dict of 'seed', 'wins_a',
+        'wins_b', 'draws', 'samples' and 'rounds', which maps battle length
+        to the number of battles that long.
+        """
+        return self.get_many([(fingerprint_a, fingerprint_b)])[0]
+
+    def get_many(self, pairs):
+        """get() for a list of (fingerprint_a, fingerprint_b) pairs, in one transaction."""
+        now = time.time()
+        found = []
+        # IMMEDIATE: the reads are followed by last_used writes, and a deferred
+        # transaction can't upgrade a stale read snapshot once another
+        # connection has committed; this waits on the busy timeout instead
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for fingerprint_a, fingerprint_b in pairs:
+                key, flipped = matchup_key(fingerprint_a, fingerprint_b)
+                row = self.db.execute(
+                    "SELECT seed, wins_first, wins_second, draws, samples, rounds FROM matchups WHERE key = ?",
+                    (key,)).fetchone()
+                if row is None:
+                    found.append(None)
+                    continue
+                self.db.execute("UPDATE matchups SET last_used = ? WHERE key = ?", (now, key))
+                seed, wins_first, wins_second, draws, samples, rounds = row
+                if flipped:
+                    wins_first, wins_second = wins_second, wins_first
+                found.append({
+                    'seed': seed,
+                    'wins_a': wins_first,
+                    'wins_b': wins_second,
+                    'draws': draws,
+                    'samples': samples,
+                    'rounds': {int(length): count for length, count in json.loads(rounds).items()},
+                })
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return found
+
+    def add(self, fingerprint_a, fingerprint_b, seed, wins_a, wins_b, draws, rounds):
+        """Adds newly simulated battles to the pairing's totals.
+
+        seed is only stored for a new entry; top-ups should continue with
+        the stored seed and the next battle index (see get()['samples']).
+        """
+        self.add_many([(fingerprint_a, fingerprint_b, seed, wins_a, wins_b, draws, rounds)])
+
+    def add_many(self, results):
+        """add() for an iterable of argument tuples, in one transaction."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for fingerprint_a, fingerprint_b, seed, wins_a, wins_b, draws, rounds in results:
+                key, flipped = matchup_key(fingerprint_a, fingerprint_b)
+                if flipped:
+                    wins_a, wins_b = wins_b, wins_a
+                row = self.db.execute("SELECT rounds FROM matchups WHERE key = ?", (key,)).fetchone()
+                merged = {}
+                if row:
+                    merged = {int(length): count for length, count in json.loads(row[0]).items()}
+                for length, count in rounds.items():
+                    merged[length] = merged.get(length, 0) + count
+                self.db.execute(
+                    "INSERT INTO matchups (key, seed, wins_first, wins_second, draws, samples, rounds, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET "
+                    "wins_first = wins_first + excluded.wins_first, "
+                    "wins_second = wins_second + excluded.wins_second, "
+                    "draws = draws + excluded.draws, "
+                    "samples = samples + excluded.samples, "
+                    "rounds = excluded.rounds, last_used = excluded.last_used",
+                    (key, seed, wins_a, wins_b, draws, wins_a + wins_b + draws, json.dumps(merged), now))
+            self.evict()
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def evict(self):
+        """Drops the least recently used entries beyond max_entries."""
+        (count,) = self.db.execute("SELECT COUNT(*) FROM matchups").fetchone()
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM matchups WHERE key IN "
+                "(SELECT key FROM matchups ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,))
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,63 @@
+# phase_timers.py
+#
+# Opt-in wall-time and call counters for the phases of a battle round.
+# run_battle binds its phase functions once at the start of a battle; only
+# when it is given a PhaseTimers does it bind timed wrappers instead, so an
+# untimed battle runs exactly the same code as before. One PhaseTimers can be
+# passed to any number of battles to aggregate a whole batch job, and
+# snapshots from worker processes can be merged into one report.
+import sys
+import time
+
+# Report order for the phases run_battle times
+PHASES = ("action", "stats", "effects", "regen", "cooldowns")
+
+class PhaseTimers:
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def wrap(self, phase, func):
+        """Returns func, timed under `phase`."""
+        seconds = self.seconds
+        calls = self.calls
+        seconds.setdefault(phase, 0.0)
+        calls.setdefault(phase, 0)
+        clock = time.perf_counter
+
+        def timed(*args):
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                seconds[phase] += clock() - start
+                calls[phase] += 1
+        return timed
+
+    def snapshot(self):
+        """{phase: (calls, seconds)}, plain data that can cross process boundaries."""
+        return {phase: (self.calls[phase], self.seconds[phase]) for phase in self.seconds}
+
+    def merge(self, snapshot):
+        for phase, (calls, seconds) in snapshot.items():
+            self.calls[phase] = self.calls.get(phase, 0) + calls
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+
+    def report(self, out=None):
+        """Prints a table of calls, total time, time per call and share for every phase."""
+        out = out or sys.stdout
+        total = sum(self.seconds.values())
+        phases = [phase for phase in PHASES if phase in self.seconds]
+        phases += sorted(phase for phase in self.seconds if phase not in PHASES)
+        print(f"{'phase':<10} {'calls':>12} {'total ms':>11} {'us/call':>9} {'share':>7}", file=out)
+        for phase in phases:
+            calls = self.calls[phase]
+            seconds = self.seconds[phase]
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            share = seconds / total if total else 0.0
+            print(f"{phase:<10} {calls:>12,} {seconds * 1000:>11.1f} {per_call:>9.2f} {share:>7.1%}", file=out)
+        print(f"{'total':<10} {sum(self.calls.values()):>12,} {total * 1000:>11.1f}", file=out)
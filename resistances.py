@@ -0,0 +1,43 @@
+# resistances.py
+#
+# Resistances compiled into dense multiplier tables. The channels are
+# "generic" plus every channel named in spells.json, each with a fixed
+# index; abilities.py stores that index on every compiled spell. A unit's
+# table holds 1 - resistance / 100 for each channel, and resisted() is the
+# one damage rule every engine uses:
+#
+#   max(0, int(amount * table[index]))
+#
+# so a hit costs one tuple index in place of dict lookups on the unit's
+# resistances. Units with the same resistances share one table.
+from functools import lru_cache
+
+import mage_rules
+
+@lru_cache(maxsize=None)
+def channels():
+    """Every damage channel, 'generic' first, then the spells.json channels sorted."""
+    named = {spell.get("channel", "generic") for spell in mage_rules.spell_data().values()}
+    return ("generic",) + tuple(sorted(named - {"generic"}))
+
+@lru_cache(maxsize=None)
+def channel_indexes():
+    return {channel: index for index, channel in enumerate(channels())}
+
+def channel_index(channel):
+    """The channel's position in resistance tables."""
+    return channel_indexes()[channel]
+
+@lru_cache(maxsize=None)
+def compile_resistances(resistances):
+    """Multiplier table for a sorted tuple of (channel, resistance) pairs."""
+    resists = dict(resistances)
+    return tuple(1 - resists.get(channel, 0) / 100 for channel in channels())
+
+def resistance_table(unit):
+    """The unit's damage multiplier for every channel, indexed as channels()."""
+    return compile_resistances(tuple(sorted(unit.get("resistances", {}).items())))
+
+def resisted(table, amount, index):
+    """Damage left after resistance: the fraction not resisted, truncated, never below zero."""
+    return max(0, int(amount * table[index]))
@@ -1,39 +1,45 @@
 # stat_analyzer.py
+import argparse
 import json
+import math
 import os
+from collections import Counter
+
+import tournament
+from battle_log import FILE_MAGIC, BattleLogReader
+from combat_events import event_from_record
+from matchup_cache import MatchupCache
+from unit_registry import REGISTRY
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-UNITS_DIR = os.path.join(SCRIPT_DIR, "units")
 STATS_TO_ANALYZE = ["str", "dex", "con", "int", "wis", "cha"]
 STAT_PRICE = 25
 BALANCED_STAT_TOTAL = STAT_PRICE * len(STATS_TO_ANALYZE)
 
-def load_unit_data(filepath):
-    """Loads unit data from a JSON file."""
-    try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"Error: File not found at '{filepath}'.")
-        return None
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON in '{filepath}'.")
-        return None
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.path.join(SCRIPT_DIR, "army_rules", "rules.json")
+# Suggested costs are rounded to multiples of this
+COST_STEP = 5
+# Under Lanchester's square law an army's strength grows with unit quality
+# times the square of its size, so equal value per point means cost grows
+# with the square root of strength
+COST_EXPONENT = 0.5
+# Every pairing counts one extra drawn battle, so unbeaten or winless units
+# still get a finite strength
+PRIOR_DRAWS = 1
 
 def analyze_stat_balance():
     """Loads unit data and analyzes the balance of their stats relative to a target."""
-    unit_files = [f for f in os.listdir(UNITS_DIR) if f.endswith(".json")]
+    unit_names = REGISTRY.names()
 
-    if not unit_files:
+    if not unit_names:
         print("No unit files found in the 'units' directory.")
         return
 
     print(f"\n--- Unit Stat Balance Analysis (Stat Price: {STAT_PRICE}) ---")
     print(f"Balanced Total Stat Points: {BALANCED_STAT_TOTAL}\n")
 
-    for filename in unit_files:
-        filepath = os.path.join(UNITS_DIR, filename)
-        unit_data = load_unit_data(filepath)
+    for unit_name in unit_names:
+        unit_data = REGISTRY.get(unit_name)
         if unit_data and 'name' in unit_data and 'stats' in unit_data and 'cost' in unit_data:
             total_stat_points = sum(unit_data['stats'].get(stat, 0) for stat in STATS_TO_ANALYZE)
             stat_difference = total_stat_points - BALANCED_STAT_TOTAL
@@ -43,7 +49,255 @@ def analyze_stat_balance():
             print(f"  Difference from Balanced: {stat_difference} ({(stat_difference / BALANCED_STAT_TOTAL) * 100:.2f}%)")
             print("-" * 30)
         else:
-            print(f"Warning: Could not process unit data in '{filename}'. Ensure 'name', 'stats', and 'cost' fields exist.")
+            print(f"Warning: Could not process unit data in '{unit_name}.json'. Ensure 'name', 'stats', and 'cost' fields exist.")
+
+# === Simulation-driven pricing ===
+def load_point_limit():
+    try:
+        with open(RULES_FILE, 'r') as f:
+            return json.load(f).get('point_limit', 0)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+def tallies_from_results(path):
+    """Rebuilds (names, tallies) from a saved tournament win-rate matrix."""
+    with open(path, 'r') as f:
+        saved = json.load(f)
+    battles = saved['battles_per_pair']
+    names = saved['units']
+    rates = saved['win_rates']
+    tallies = {}
+    for i, name_a in enumerate(names):
+        for name_b in names[i + 1:]:
+            wins_a = round((rates[name_a].get(name_b) or 0) * battles)
+            wins_b = round((rates[name_b].get(name_a) or 0) * battles)
+            tallies[(name_a, name_b)] = [wins_a, wins_b, battles - wins_a - wins_b]
+    return names, tallies
+
+def fit_bradley_terry(names, tallies, iterations=10000, tolerance=1e-10):
+    """Fits Bradley-Terry strengths, P(a beats b) = s_a / (s_a + s_b), to match tallies.
+
+    Draws count as half a win for each side. Uses the standard
+    minorization-maximization update; strengths are scaled to a geometric
+    mean of 1.
+    """
+    scores = {name: 0.0 for name in names}
+    games = {name: {} for name in names}
+    for (name_a, name_b), (wins_a, wins_b, draws) in tallies.items():
+        draws += PRIOR_DRAWS
+        scores[name_a] += wins_a + draws / 2
+        scores[name_b] += wins_b + draws / 2
+        games[name_a][name_b] = games[name_b][name_a] = wins_a + wins_b + draws
+
+    strengths = {name: 1.0 for name in names}
+    for _ in range(iterations):
+        updated = {}
+        for name in names:
+            denominator = sum(count / (strengths[name] + strengths[other])
+                              for other, count in games[name].items())
+            updated[name] = scores[name] / denominator if denominator else 1.0
+        mean_log = sum(math.log(value) for value in updated.values()) / len(updated)
+        scale = math.exp(mean_log)
+        updated = {name: value / scale for name, value in updated.items()}
+        change = max(abs(updated[name] / strengths[name] - 1) for name in names)
+        strengths = updated
+        if change < tolerance:
+            break
+    return strengths
+
+def suggest_costs(strengths, current_costs, point_limit):
+    """Prices units by strength at the same average cost the roster has today.
+
+    Keeping the average means armies under the drafter's point_limit stay
+    about the same size; no unit is priced above point_limit or below COST_STEP.
+    """
+    weights = {name: strength ** COST_EXPONENT for name, strength in strengths.items()}
+    priced = [name for name in weights if current_costs.get(name)]
+    average_cost = sum(current_costs[name] for name in priced) / len(priced) if priced else 100
+    average_weight = sum(weights[name] for name in priced) / len(priced) if priced else 1
+    ceiling = point_limit or None
+    suggested = {}
+    for name, weight in weights.items():
+        cost = round(weight / average_weight * average_cost / COST_STEP) * COST_STEP
+        cost = max(COST_STEP, cost)
+        if ceiling:
+            cost = min(ceiling, cost)
+        suggested[name] = cost
+    return suggested
+
+def recommend_costs(battles=200, workers=None, results_path=None, use_cache=True):
+    """Simulates (or reloads) a round-robin, fits strengths and prints suggested costs.
+
+    With use_cache, only pairs missing from the matchup cache are simulated,
+    so re-pricing after editing one unit only replays that unit's pairs.
+    """
+    if results_path:
+        names, tallies = tallies_from_results(results_path)
+        print(f"Using saved matchups from '{results_path}'.")
+    else:
+        seed = tournament.new_master_seed()
+        print(f"Simulating up to {battles} battles per pair (seed {seed})...")
+        cache = MatchupCache() if use_cache else None
+        names, tallies = tournament.run_tournament(battles, workers, seed=seed, cache=cache)
+        if cache is not None:
+            cache.close()
+    if len(names) < 2:
+        print("Need at least two units to compare.")
+        return
+
+    point_limit = load_point_limit()
+    strengths = fit_bradley_terry(names, tallies)
+    current = {name: (REGISTRY.get(name) or {}).get('cost') for name in names}
+    suggested = suggest_costs(strengths, current, point_limit)
+
+    width = max(len(name) for name in names)
+    print(f"\n--- Suggested Unit Costs (point limit: {point_limit}) ---")
+    print(f"{'unit':<{width}} | strength | current | suggested")
+    for name in sorted(names, key=strengths.get, reverse=True):
+        cost = current[name] if current[name] is not None else "-"
+        print(f"{name:<{width}} | {strengths[name]:8.3f} | {cost:>7} | {suggested[name]:>9}")
+
+# === Battle log analysis ===
+# Recorded logs (battle_log binary files or JsonLinesRecorder output) are
+# read as a stream of events and folded into running totals in one pass, so
+# memory stays flat however large the logs are.
+HISTOGRAM_ROWS = 20
+
+def read_events(paths):
+    """Yields every event in the given logs, one at a time."""
+    for path in paths:
+        with open(path, 'rb') as f:
+            binary = f.read(len(FILE_MAGIC)) == FILE_MAGIC
+        if binary:
+            reader = BattleLogReader(path)
+            try:
+                for _, events in reader:
+                    yield from events
+            finally:
+                reader.close()
+        else:
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield event_from_record(json.loads(line))
+
+def new_unit_totals():
+    return {
+        'battles': 0,
+        'rounds': 0,
+        'damage': 0,
+        'attacks': 0,
+        'hits': 0,
+        'actions': Counter(),
+        'effect_rounds': 0,
+    }
+
+def aggregate_events(events):
+    """Folds an event stream into per-unit totals and a battle-length histogram.
+
+    Effect uptime counts the rounds a unit ends with at least one effect
+    active on it. Totals are per side fought, so a mirror battle (a unit
+    against itself) counts its battle and rounds twice, once for each side,
+    alongside both sides' damage and actions. Events only name the unit, so
+    a mirror's uptime is the share of rounds either side ended with an
+    effect active, not a per-side figure.
+    """
+    units = {}
+    lengths = Counter()
+    ends = Counter()
+    fighters = ()
+    active = {}
+    for event in events:
+        kind = event.kind
+        if kind == 'attack':
+            totals = units[event.actor]
+            totals['actions']['attack'] += 1
+            totals['attacks'] += 1
+            if event.hit:
+                totals['hits'] += 1
+                totals['damage'] += event.damage
+        elif kind == 'cast' or kind == 'skill':
+            totals = units[event.actor]
+            totals['actions'][kind] += 1
+            totals['damage'] += event.damage
+        elif kind == 'effect_applied':
+            active[event.unit] = active.get(event.unit, 0) + 1
+        elif kind == 'effect_expired':
+            active[event.unit] = active.get(event.unit, 0) - 1
+        elif kind == 'round_end':
+            for name in fighters:
+                if active.get(name, 0) > 0:
+                    units[name]['effect_rounds'] += 1
+        elif kind == 'battle_start':
+            fighters = (event.unit1, event.unit2)
+            active = {}
+            for name in fighters:
+                if name not in units:
+                    units[name] = new_unit_totals()
+        elif kind == 'battle_end':
+            lengths[event.rounds] += 1
+            ends[event.reason] += 1
+            for name in fighters:
+                units[name]['battles'] += 1
+                units[name]['rounds'] += event.rounds
+    return units, lengths, ends
+
+def histogram_rows(lengths, rows=HISTOGRAM_ROWS):
+    """Buckets a {length: count} histogram into at most `rows` equal-width bins."""
+    low, high = min(lengths), max(lengths)
+    width = max(1, math.ceil((high - low + 1) / rows))
+    bins = Counter()
+    for length, count in lengths.items():
+        bins[low + (length - low) // width * width] += count
+    return [(start, start + width - 1, bins[start]) for start in range(low, high + 1, width)]
+
+def report_logs(paths):
+    units, lengths, ends = aggregate_events(read_events(paths))
+    if not lengths:
+        print("No battles found in the logs.")
+        return
+    battles = sum(lengths.values())
+    mean = sum(length * count for length, count in lengths.items()) / battles
+    endings = ", ".join(f"{reason} {count}" for reason, count in ends.most_common())
+    print(f"\n--- Battle Log Analysis ({battles:,} battles; {endings}) ---")
+
+    width = max(len(name) for name in units)
+    print(f"{'unit':<{width}} | battles | dmg/round | hit rate | attack  cast skill | effect uptime")
+    for name in sorted(units):
+        totals = units[name]
+        rounds = totals['rounds'] or 1
+        actions = totals['actions']
+        acted = sum(actions.values()) or 1
+        hit_rate = f"{totals['hits'] / totals['attacks']:8.1%}" if totals['attacks'] else f"{'-':>8}"
+        print(f"{name:<{width}} | {totals['battles']:>7,} | {totals['damage'] / rounds:9.2f} | {hit_rate} | "
+              f"{actions['attack'] / acted:6.0%} {actions['cast'] / acted:5.0%} {actions['skill'] / acted:5.0%} | "
+              f"{totals['effect_rounds'] / rounds:13.1%}")
+
+    print(f"\nBattle length (mean {mean:.1f} rounds):")
+    rows = histogram_rows(lengths)
+    peak = max(count for _, _, count in rows)
+    for start, end, count in rows:
+        label = f"{start}" if start == end else f"{start}-{end}"
+        print(f"{label:>9} | {count:>8,} {'#' * round(40 * count / peak)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Unit balance reports.")
+    parser.add_argument("--price", action="store_true",
+                        help="suggest costs from simulated matchups instead of stat totals")
+    parser.add_argument("-n", "--battles", type=int, default=200, help="battles per pair when pricing")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--from-results", metavar="PATH",
+                        help="price from a saved tournament.py matrix instead of simulating")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the matchup cache and simulate every pair")
+    parser.add_argument("--logs", nargs="+", metavar="PATH",
+                        help="analyze recorded battle logs (battle_log binary or JSON lines) instead")
+    args = parser.parse_args()
+    if args.logs:
+        report_logs(args.logs)
+    elif args.price:
+        recommend_costs(args.battles, args.workers, args.from_results, not args.no_cache)
+    else:
+        analyze_stat_balance()
 
 if __name__ == "__main__":
-    analyze_stat_balance()
+    main()
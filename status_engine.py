@@ -1,5 +1,89 @@
+import heapq
+
+from combat_events import NULL, EffectExpired
+
+class EffectStore:
+    """A unit's active effects, with running modifier sums and a heap of expiry times.
+
+    Every effect ticks down once per tick(), so instead of decrementing each
+    duration the store keeps a clock and the tick each effect expires on.
+    Adding or removing an effect updates the per-stat sums directly (also
+    kept per source, for apply_effects' unit_name filter), and tick() pops
+    only the effects that expire. Removed effects are dropped from the heap
+    lazily, when their expiry comes up. Iterating yields effects in the
+    order they were added; effect dicts are never modified.
+    """
+    __slots__ = ('clock', 'sums', 'by_source', 'entries', 'heap', 'ids', 'count')
+
+    def __init__(self, effects=()):
+        self.clock = 0
+        self.sums = {}           # stat -> total modifier
+        self.by_source = {}      # source (None when unset) -> {stat: total modifier}
+        self.entries = {}        # sequence number -> (effect, expiry tick)
+        self.heap = []           # (expiry tick, sequence number)
+        self.ids = {}            # id(effect) -> sequence number
+        self.count = 0
+        for effect in effects:
+            self.add(effect)
+
+    def add(self, effect):
+        # Like a duration of 1, a duration of 0 or less expires on the next tick
+        expiry = self.clock + max(effect.get('duration', 0), 1)
+        sequence = self.count
+        self.count += 1
+        self.entries[sequence] = (effect, expiry)
+        self.ids[id(effect)] = sequence
+        heapq.heappush(self.heap, (expiry, sequence))
+        self._adjust(effect, 1)
+
+    def remove(self, effect):
+        sequence = self.ids.pop(id(effect))
+        del self.entries[sequence]
+        self._adjust(effect, -1)
+
+    def _adjust(self, effect, sign):
+        stat = effect.get('stat')
+        modifier = sign * effect.get('modifier', 0)
+        self.sums[stat] = self.sums.get(stat, 0) + modifier
+        per_source = self.by_source.setdefault(effect.get('source') or None, {})
+        per_source[stat] = per_source.get(stat, 0) + modifier
+
+    def tick(self):
+        """Advances one turn; removes and returns the effects that expired, oldest first."""
+        self.clock += 1
+        heap = self.heap
+        expired = []
+        while heap and heap[0][0] <= self.clock:
+            _, sequence = heapq.heappop(heap)
+            entry = self.entries.pop(sequence, None)
+            if entry is not None:
+                effect = entry[0]
+                del self.ids[id(effect)]
+                self._adjust(effect, -1)
+                expired.append(effect)
+        return expired
+
+    def modifier(self, stat, unit_name=None):
+        """Total modifier on stat; with unit_name, only from that source or no source."""
+        if unit_name is None:
+            return self.sums.get(stat, 0)
+        return (self.by_source.get(None, {}).get(stat, 0)
+                + self.by_source.get(unit_name, {}).get(stat, 0))
+
+    def __iter__(self):
+        return (effect for effect, _ in self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
 def apply_effects(derived_stats, active_effects, unit_name=None):
-    """Applies all active effects to derived stats (modifies in-place)."""
+    """Applies all active effects to derived stats (modifies in-place).
+
+    active_effects is an EffectStore or a plain list of effect dicts.
+    """
     # Reset all derived bonuses to base before reapplying effects
     bonuses = {
         "str": 0,
@@ -10,14 +94,18 @@ def apply_effects(derived_stats, active_effects, unit_name=None):
         "ac": 0
     }
 
-    for effect in active_effects:
-        if unit_name and effect.get("source") and effect["source"] != unit_name:
-            continue  # Only apply self-buffs to the appropriate unit
+    if isinstance(active_effects, EffectStore):
+        for stat in bonuses:
+            bonuses[stat] = active_effects.modifier(stat, unit_name)
+    else:
+        for effect in active_effects:
+            if unit_name and effect.get("source") and effect["source"] != unit_name:
+                continue  # Only apply self-buffs to the appropriate unit
 
-        stat = effect.get("stat")
-        mod = effect.get("modifier", 0)
-        if stat in bonuses:
-            bonuses[stat] += mod
+            stat = effect.get("stat")
+            mod = effect.get("modifier", 0)
+            if stat in bonuses:
+                bonuses[stat] += mod
 
     # Apply bonuses to derived stats
     for stat, bonus in bonuses.items():
@@ -39,13 +127,19 @@ def apply_effects(derived_stats, active_effects, unit_name=None):
         elif stat == "wis":
             derived_stats["mana_total"] += bonus * 5
 
-def tick_and_clean_effects(active_effects):
-    """Decrements durations and removes expired effects."""
-    expired = []
-    for effect in active_effects:
-        effect['duration'] -= 1
-        if effect['duration'] <= 0:
-            expired.append(effect)
+def tick_and_clean_effects(active_effects, sink=NULL, unit_name=None):
+    """Decrements durations and removes expired effects (an EffectStore or a list)."""
+    if isinstance(active_effects, EffectStore):
+        expired = active_effects.tick()
+    else:
+        expired = []
+        for effect in active_effects:
+            effect['duration'] -= 1
+            if effect['duration'] <= 0:
+                expired.append(effect)
+        if expired:
+            active_effects[:] = [effect for effect in active_effects if effect['duration'] > 0]
     for e in expired:
-        active_effects.remove(e)
+        if sink.active:
+            sink.emit(EffectExpired(unit_name, e.get('stat'), e.get('modifier', 0), e.get('source')))
     return expired
\ No newline at end of file
@@ -0,0 +1,91 @@
+# Round trips of engine events through the binary battle log.
+import pytest
+
+import unit_loader
+from battle_log import BattleLogReader, BinaryLogWriter
+from battle_simulator import battle
+from combat_events import EventLog
+from combat_loop import run_battle
+from rng_streams import battle_rng
+
+SEED = 20240601
+BATTLES = 20
+
+def simulate(engine, unit1, unit2, index, sink):
+    rng = battle_rng(SEED, unit1['name'], unit2['name'], index)
+    if engine == "battle_simulator":
+        battle(unit1, unit2, sink=sink, rng=rng)
+    else:
+        run_battle(unit1, unit2, sink=sink, rng=rng)
+
+def record(path, engine, unit1, unit2):
+    """Writes BATTLES seeded battles to a log; returns each battle's events as emitted."""
+    writer = BinaryLogWriter(path)
+    emitted = []
+    for index in range(BATTLES):
+        log = EventLog()
+        simulate(engine, unit1, unit2, index, log)
+        for event in log.events:
+            writer.emit(event)
+        emitted.append(log.events)
+    writer.close()
+    return emitted
+
+@pytest.mark.parametrize("engine", ["combat_loop", "battle_simulator"])
+@pytest.mark.parametrize("name1, name2", [("dark_knight", "goblin_guard"), ("psylocke", "flamecaster"),
+                                          ("iron_guard", "croakbrute")])
+def test_events_round_trip(tmp_path, engine, name1, name2):
+    path = str(tmp_path / "battles.blog")
+    emitted = record(path, engine, unit_loader.load_unit(name1), unit_loader.load_unit(name2))
+
+    reader = BattleLogReader(path)
+    assert reader.battle_ids() == list(range(BATTLES))
+    for battle_id, events in enumerate(emitted):
+        assert list(reader.events(battle_id)) == events
+    assert [list(events) for _, events in reader] == emitted
+    reader.close()
+
+def test_appending_continues_battle_ids(tmp_path):
+    path = str(tmp_path / "battles.blog")
+    unit1, unit2 = unit_loader.load_unit("dark_knight"), unit_loader.load_unit("goblin_guard")
+    first = record(path, "combat_loop", unit1, unit2)
+    second = record(path, "combat_loop", unit1, unit2)
+    reader = BattleLogReader(path)
+    assert len(reader) == 2 * BATTLES
+    assert list(reader.events(BATTLES)) == second[0]
+    assert list(reader.events(0)) == first[0]
+    reader.close()
+
+@pytest.mark.parametrize("engine", ["combat_loop", "battle_simulator"])
+def test_mirror_match_keeps_sides(tmp_path, engine):
+    unit = unit_loader.load_unit("croakbrute")
+    twin = dict(unit, name="croakbrute_twin")
+    mirror_path = str(tmp_path / "mirror.blog")
+    twin_path = str(tmp_path / "twin.blog")
+    # Same seeds; only the second unit's name differs
+    writer = BinaryLogWriter(mirror_path)
+    for index in range(BATTLES):
+        simulate(engine, unit, unit, index, writer)
+    writer.close()
+    writer = BinaryLogWriter(twin_path)
+    for index in range(BATTLES):
+        rng = battle_rng(SEED, unit['name'], unit['name'], index)
+        if engine == "battle_simulator":
+            battle(unit, twin, sink=writer, rng=rng)
+        else:
+            run_battle(unit, twin, sink=writer, rng=rng)
+    writer.close()
+
+    mirror, twins = BattleLogReader(mirror_path), BattleLogReader(twin_path)
+    expired = 0
+    for battle_id in range(BATTLES):
+        assert mirror.header(battle_id)[2] == twins.header(battle_id)[2]
+        # Round, kind and side of every record match; names are compared decoded
+        records = list(mirror.records(battle_id))
+        assert [record[:3] for record in records] == [record[:3] for record in twins.records(battle_id)]
+        assert [repr(event) for event in mirror.events(battle_id)] == \
+            [repr(event).replace(twin['name'], unit['name']) for event in twins.events(battle_id)]
+        expired += sum(record[1] == 6 for record in records)
+    assert expired, "the battles should exercise expiring effects"
+    mirror.close()
+    twins.close()
@@ -0,0 +1,71 @@
+# Seeded checks that vector_engine and duel_solver reproduce the outcome
+# distribution of the reference engine, combat_loop.run_battle.
+import pytest
+
+import duel_solver
+import unit_loader
+import vector_engine
+from combat_loop import run_battle
+from rng_streams import battle_rng
+
+SEED = 20240601
+REFERENCE_BATTLES = 2000
+VECTOR_BATTLES = 20000
+# About four standard errors of a 2000-battle rate
+TOLERANCE = 0.045
+
+WALL = {'name': 'wall', 'stats': {'str': 3, 'dex': 10, 'con': 100, 'int': 10, 'wis': 10}, 'tags': []}
+WEAK = {'name': 'weak', 'stats': {'str': 9, 'dex': 10, 'con': 40, 'int': 10, 'wis': 10}, 'tags': []}
+
+# Melee-only, caster, skill-user and mirror matchups from units/
+PAIRS = [("dark_knight", "goblin_guard"), ("psylocke", "flamecaster"),
+         ("iron_guard", "croakbrute"), ("iron_guard", "iron_guard")]
+
+def reference_rates(unit1, unit2):
+    wins = {1: 0, 2: 0, None: 0}
+    for index in range(REFERENCE_BATTLES):
+        rng = battle_rng(SEED, unit1['name'], unit2['name'], index)
+        wins[run_battle(unit1, unit2, quiet=True, rng=rng)['side']] += 1
+    return wins[1] / REFERENCE_BATTLES, wins[2] / REFERENCE_BATTLES, wins[None] / REFERENCE_BATTLES
+
+def assert_rates_match(rates, outcome):
+    unit1, unit2, draws = rates
+    assert outcome['unit1_win_rate'] == pytest.approx(unit1, abs=TOLERANCE)
+    assert outcome['unit2_win_rate'] == pytest.approx(unit2, abs=TOLERANCE)
+    assert outcome['draw_rate'] == pytest.approx(draws, abs=TOLERANCE)
+
+def load_pair(name1, name2):
+    return unit_loader.load_unit(name1), unit_loader.load_unit(name2)
+
+@pytest.mark.parametrize("name1, name2", PAIRS)
+def test_vector_engine_matches_run_battle(name1, name2):
+    unit1, unit2 = load_pair(name1, name2)
+    outcome = vector_engine.summarize(vector_engine.simulate(unit1, unit2, VECTOR_BATTLES, seed=SEED))
+    assert_rates_match(reference_rates(unit1, unit2), outcome)
+
+@pytest.mark.parametrize("name1, name2", PAIRS)
+def test_solver_matches_run_battle(name1, name2):
+    unit1, unit2 = load_pair(name1, name2)
+    outcome = duel_solver.solve(unit1, unit2)
+    assert outcome['unresolved'] < 1e-9
+    assert_rates_match(reference_rates(unit1, unit2), outcome)
+
+def test_solver_agrees_with_melee_solver():
+    unit1, unit2 = load_pair("dark_knight", "goblin_guard")
+    general = duel_solver.solve(unit1, unit2)
+    melee = duel_solver.solve_melee(unit1, unit2)
+    assert general['unit1_win_rate'] == pytest.approx(melee['unit1_win_rate'], abs=1e-9)
+    assert general['mean_rounds'] == pytest.approx(melee['mean_rounds'], abs=1e-6)
+
+def test_draw_rates_match_run_battle():
+    rates = reference_rates(WEAK, WALL)
+    assert rates[2] > 0  # the pairing really does produce stalemates
+    assert_rates_match(rates, vector_engine.summarize(vector_engine.simulate(WEAK, WALL, VECTOR_BATTLES, seed=SEED)))
+    assert_rates_match(rates, duel_solver.solve(WEAK, WALL))
+
+def test_stalemate_is_a_draw_everywhere():
+    wall2 = dict(WALL, name='wall2')
+    result = run_battle(WALL, wall2, quiet=True, rng=battle_rng(SEED, "wall"))
+    assert (result['side'], result['end']) == (None, "stalemate")
+    assert vector_engine.summarize(vector_engine.simulate(WALL, wall2, 100, seed=SEED))['draw_rate'] == 1.0
+    assert duel_solver.solve(WALL, wall2)['draw_rate'] == pytest.approx(1.0)
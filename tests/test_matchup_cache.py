@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from matchup_cache import MatchupCache, matchup_key
+
+A = "a" * 64
+B = "b" * 64
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite")
+
+def test_miss_returns_none(cache_path):
+    cache = MatchupCache(cache_path)
+    assert cache.get(A, B) is None
+    cache.close()
+
+def test_pair_and_reverse_share_one_entry(cache_path):
+    cache = MatchupCache(cache_path)
+    assert matchup_key(A, B)[0] == matchup_key(B, A)[0]
+    assert matchup_key(A, B)[1] != matchup_key(B, A)[1]
+    cache.add(A, B, 7, 6, 3, 1, {5: 4, 6: 6})
+    # Topped up from the other side: its wins are B's
+    cache.add(B, A, 99, 2, 5, 0, {6: 1, 7: 6})
+
+    forward = cache.get(A, B)
+    assert forward == {'seed': 7, 'wins_a': 11, 'wins_b': 5, 'draws': 1, 'samples': 17,
+                       'rounds': {5: 4, 6: 7, 7: 6}}
+    backward = cache.get(B, A)
+    assert (backward['wins_a'], backward['wins_b'], backward['draws']) == (5, 11, 1)
+    cache.close()
+
+def test_get_many_keeps_order_and_misses(cache_path):
+    cache = MatchupCache(cache_path)
+    cache.add(A, B, 1, 1, 0, 0, {3: 1})
+    found = cache.get_many([(B, A), (A, "c" * 64), (A, B)])
+    assert found[1] is None
+    assert (found[0]['wins_a'], found[2]['wins_a']) == (0, 1)
+    cache.close()
+
+def test_eviction_drops_least_recently_used(cache_path):
+    cache = MatchupCache(cache_path, max_entries=2)
+    cache.add(A, B, 1, 1, 0, 0, {1: 1})
+    cache.add(A, "c" * 64, 1, 1, 0, 0, {1: 1})
+    cache.get(A, B)
+    cache.add(A, "d" * 64, 1, 1, 0, 0, {1: 1})
+    assert cache.get(A, B) is not None
+    assert cache.get(A, "c" * 64) is None
+    cache.close()
+
+def test_concurrent_readers_and_writers(cache_path):
+    MatchupCache(cache_path).close()
+    errors = []
+
+    def worker(other):
+        cache = MatchupCache(cache_path)
+        try:
+            for _ in range(50):
+                cache.get_many([(A, B), (A, other)])
+                cache.add(A, B, 1, 1, 0, 0, {2: 1})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            cache.close()
+
+    threads = [threading.Thread(target=worker, args=(str(i) * 64,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    cache = MatchupCache(cache_path)
+    assert cache.get(A, B)['samples'] == 200
+    cache.close()
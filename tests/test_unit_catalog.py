@@ -0,0 +1,59 @@
+import json
+import multiprocessing
+
+import pytest
+
+from unit_catalog import UnitCatalog
+
+WORKERS = 4
+UNITS_PER_WORKER = 200
+
+def unit(worker, index):
+    return {'name': f"w{worker}_u{index}", 'stats': {'str': worker, 'dex': index}, 'tags': ["x" * (index % 37)]}
+
+def append_units(catalog, worker):
+    for index in range(UNITS_PER_WORKER):
+        data = unit(worker, index)
+        catalog.put(data['name'], data)
+        if index % 50 == 0:
+            catalog.set_units_mtime(index)
+
+def test_put_get_remove_and_reopen(tmp_path):
+    path = str(tmp_path / "units.catalog")
+    catalog = UnitCatalog(path)
+    catalog.put("a", {'name': "a"})
+    catalog.put("b", {'name': "b"})
+    catalog.put("a", {'name': "a", 'cost': 3})
+    catalog.remove("b")
+    assert catalog.get("a") == {'name': "a", 'cost': 3}
+    assert "b" not in catalog
+    catalog.close()
+    reopened = UnitCatalog(path)
+    assert reopened.names() == ["a"]
+    assert reopened.get("a") == {'name': "a", 'cost': 3}
+    reopened.compact()
+    assert reopened.get("a") == {'name': "a", 'cost': 3}
+    reopened.close()
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_forked_writers_share_a_catalog(tmp_path):
+    path = str(tmp_path / "units.catalog")
+    # Opened before forking, as the shared registry is in tournament workers
+    catalog = UnitCatalog(path)
+    catalog.put("seed", {'name': "seed"})
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=append_units, args=(catalog, worker)) for worker in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    catalog.close()
+
+    reopened = UnitCatalog(path)
+    assert len(reopened.names()) == WORKERS * UNITS_PER_WORKER + 1
+    for worker in range(WORKERS):
+        for index in range(UNITS_PER_WORKER):
+            data = unit(worker, index)
+            assert reopened.get(data['name']) == json.loads(json.dumps(data))
+    reopened.close()
@@ -0,0 +1,369 @@
+# tournament.py
+import argparse
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import unit_loader
+from combat_core import ENGINE_VERSION
+from combat_events import CONSOLE
+from combat_loop import run_battle
+from matchup_cache import DEFAULT_CACHE_PATH, MatchupCache, unit_fingerprint
+from phase_timers import PhaseTimers
+from rng_streams import battle_rng, new_master_seed
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(SCRIPT_DIR, "tournament_results.json")
+DEFAULT_CHUNK_BATTLES = 2000
+
+# Roster for the current worker process, loaded once by init_worker
+_roster = None
+# Phase timers of the current worker process, when profiling
+_timers = None
+
+def load_roster():
+    """Loads every unit in the units folder, skipping files that fail to load."""
+    roster = {}
+    for name in sorted(unit_loader.list_unit_files()):
+        unit = unit_loader.load_unit(name)
+        if unit:
+            roster[name] = unit
+    return roster
+
+def init_worker(profile=False):
+    global _roster, _timers
+    # The parent has already reported the roster's unknown abilities
+    warnings.simplefilter("ignore", unit_loader.UnknownAbilityWarning)
+    _roster = load_roster()
+    _timers = PhaseTimers() if profile else None
+
+def play_battle(unit_a, unit_b, seed, index, sink=None, timers=None):
+    """Plays battle number `index` of a pairing; returns (result, side unit_a fought on).
+
+    Sides alternate on the battle index so neither unit always moves first,
+    and the dice come from the battle's own stream, so the same seed and
+    index always replay the same battle.
+    """
+    rng = battle_rng(seed, unit_a['name'], unit_b['name'], index)
+    if index % 2 == 0:
+        return run_battle(unit_a, unit_b, quiet=sink is None, sink=sink, rng=rng, timers=timers), 1
+    return run_battle(unit_b, unit_a, quiet=sink is None, sink=sink, rng=rng, timers=timers), 2
+
+def play_chunk(chunk):
+    """Plays a list of (unit_a, unit_b, seed, first_battle, count) jobs quietly.
+
+    Returns (results, timings): results holds (unit_a, unit_b, wins_a,
+    wins_b, draws, rounds) per job, where rounds counts battles by length;
+    timings is this chunk's phase timer snapshot, or None when not profiling.
+    """
+    results = []
+    for name_a, name_b, seed, first, count in chunk:
+        unit_a = _roster[name_a]
+        unit_b = _roster[name_b]
+        wins_a = wins_b = draws = 0
+        rounds = {}
+        for index in range(first, first + count):
+            result, a_side = play_battle(unit_a, unit_b, seed, index, timers=_timers)
+            side = result['side']
+            if side is None:
+                draws += 1
+            elif side == a_side:
+                wins_a += 1
+            else:
+                wins_b += 1
+            rounds[result['rounds']] = rounds.get(result['rounds'], 0) + 1
+        results.append((name_a, name_b, wins_a, wins_b, draws, rounds))
+    if _timers is None:
+        return results, None
+    timings = _timers.snapshot()
+    _timers.reset()
+    return results, timings
+
+def make_chunks(jobs, chunk_battles):
+    """Splits (unit_a, unit_b, seed, first_battle, count) jobs into chunks of roughly chunk_battles.
+
+    Large jobs are cut into several pieces and small ones are packed
+    together, so each task sent to the pool carries a similar amount of work.
+    """
+    chunks = []
+    current = []
+    current_size = 0
+    for name_a, name_b, seed, first, battles in jobs:
+        end = first + battles
+        while first < end:
+            count = min(end - first, chunk_battles - current_size)
+            current.append((name_a, name_b, seed, first, count))
+            current_size += count
+            first += count
+            if current_size >= chunk_battles:
+                chunks.append(current)
+                current = []
+                current_size = 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+def simulate_jobs(jobs, workers=None, chunk_battles=DEFAULT_CHUNK_BATTLES, timers=None):
+    """Plays jobs on a process pool; returns {(unit_a, unit_b): (wins_a, wins_b, draws, rounds)}.
+
+    Phase timings from every worker are merged into `timers` if one is given.
+    """
+    totals = {}
+    pending = sum(job[4] for job in jobs)
+    if not pending:
+        return totals
+    workers = workers or os.cpu_count() or 1
+    # Keep enough chunks around that every core stays busy until the end
+    chunk_battles = max(1, min(chunk_battles, pending // (workers * 4) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(timers is not None,)) as pool:
+        for results, timings in pool.map(play_chunk, make_chunks(jobs, chunk_battles)):
+            if timings:
+                timers.merge(timings)
+            for name_a, name_b, wins_a, wins_b, draws, rounds in results:
+                total = totals.setdefault((name_a, name_b), [0, 0, 0, {}])
+                total[0] += wins_a
+                total[1] += wins_b
+                total[2] += draws
+                for length, count in rounds.items():
+                    total[3][length] = total[3].get(length, 0) + count
+    return totals
+
+def play_pairs(roster, pairs, battles, workers=None, chunk_battles=DEFAULT_CHUNK_BATTLES, seed=0, cache=None,
+               timers=None):
+    """Plays `battles` battles for each (unit_a, unit_b) in pairs; returns {pair: [wins_a, wins_b, draws]}.
+
+    With a matchup_cache.MatchupCache, pairs that already have `battles`
+    results for their current unit and rule data are not simulated again,
+    pairs with fewer are topped up, and new results are stored.
+    """
+    tallies = {pair: [0, 0, 0] for pair in pairs}
+    jobs = []
+    if cache is None:
+        jobs = [(name_a, name_b, seed, 0, battles) for name_a, name_b in pairs]
+    else:
+        fingerprints = {name: unit_fingerprint(unit) for name, unit in roster.items()}
+        keys = [(fingerprints[name_a], fingerprints[name_b]) for name_a, name_b in pairs]
+        for pair, entry in zip(pairs, cache.get_many(keys)):
+            if entry is None:
+                jobs.append(pair + (seed, 0, battles))
+                continue
+            tallies[pair] = [entry['wins_a'], entry['wins_b'], entry['draws']]
+            if entry['samples'] < battles:
+                jobs.append(pair + (entry['seed'], entry['samples'], battles - entry['samples']))
+
+    totals = simulate_jobs(jobs, workers, chunk_battles, timers)
+    for pair, (wins_a, wins_b, draws, _) in totals.items():
+        tally = tallies[pair]
+        tally[0] += wins_a
+        tally[1] += wins_b
+        tally[2] += draws
+    if cache is not None and totals:
+        job_seeds = {(name_a, name_b): job_seed for name_a, name_b, job_seed, _, _ in jobs}
+        cache.add_many((fingerprints[name_a], fingerprints[name_b], job_seeds[(name_a, name_b)],
+                        wins_a, wins_b, draws, rounds)
+                       for (name_a, name_b), (wins_a, wins_b, draws, rounds) in totals.items())
+    return tallies
+
+def run_tournament(battles=100, workers=None, chunk_battles=DEFAULT_CHUNK_BATTLES, seed=0, cache=None,
+                   timers=None):
+    """Plays every pair of units against each other and returns the tallies.
+
+    Returns (names, tallies) where tallies maps (unit_a, unit_b) to
+    [wins_a, wins_b, draws] for every pair with unit_a before unit_b.
+    See play_pairs for how a cache is used.
+    """
+    roster = load_roster()
+    names = list(roster)
+    pairs = [(name_a, name_b) for i, name_a in enumerate(names) for name_b in names[i + 1:]]
+    return names, play_pairs(roster, pairs, battles, workers, chunk_battles, seed, cache, timers)
+
+# === Incremental refresh ===
+def roster_changes(previous_fingerprints, fingerprints):
+    """Units (added, removed, edited) between two {name: unit_fingerprint} maps."""
+    added = sorted(name for name in fingerprints if name not in previous_fingerprints)
+    removed = sorted(name for name in previous_fingerprints if name not in fingerprints)
+    edited = sorted(name for name in fingerprints
+                    if name in previous_fingerprints and previous_fingerprints[name] != fingerprints[name])
+    return added, removed, edited
+
+def refresh_tournament(previous, battles, workers=None, chunk_battles=DEFAULT_CHUNK_BATTLES, seed=0, cache=None,
+                       timers=None):
+    """Brings a saved tournament up to date with the units folder.
+
+    `previous` is a results dict as written by write_matrix. Only pairs
+    involving added or edited units are played; every other win rate is
+    kept, unless the results came from another ENGINE_VERSION, in which
+    case every pair is played again. Returns (names, matrix, draws, fingerprints, (added, removed,
+    edited), moved) where moved lists (unit_a, unit_b, old_rate, new_rate)
+    for pairs that existed before and were played again.
+    """
+    roster = load_roster()
+    names = list(roster)
+    fingerprints = {name: unit_fingerprint(unit) for name, unit in roster.items()}
+    changes = roster_changes(previous.get('fingerprints', {}), fingerprints)
+    stale = set(changes[0]) | set(changes[2])
+    if previous.get('engine_version') != ENGINE_VERSION:
+        stale = set(names)
+    pairs = [(name_a, name_b) for i, name_a in enumerate(names) for name_b in names[i + 1:]
+             if name_a in stale or name_b in stale]
+
+    old = previous.get('win_rates', {})
+    old_draws = previous.get('draw_rates', {})
+    matrix = {name: {other: rate for other, rate in old.get(name, {}).items() if other in roster}
+              for name in names}
+    draws = {name: {other: rate for other, rate in old_draws.get(name, {}).items() if other in roster}
+             for name in names}
+    tallies = play_pairs(roster, pairs, battles, workers, chunk_battles, seed, cache, timers)
+    fresh = win_rate_matrix(names, tallies)
+    fresh_draws = draw_rate_matrix(names, tallies)
+    moved = []
+    for name_a, name_b in pairs:
+        new_rate = fresh[name_a][name_b]
+        old_rate = old.get(name_a, {}).get(name_b)
+        if old_rate is not None and new_rate is not None:
+            moved.append((name_a, name_b, old_rate, new_rate))
+        matrix[name_a][name_b] = new_rate
+        matrix[name_b][name_a] = fresh[name_b][name_a]
+        draws[name_a][name_b] = draws[name_b][name_a] = fresh_draws[name_a][name_b]
+    return names, matrix, draws, fingerprints, changes, moved
+
+def win_rate_matrix(names, tallies):
+    """Builds matrix[row][col] = fraction of battles the row unit won against the column unit."""
+    matrix = {name: {} for name in names}
+    for (name_a, name_b), (wins_a, wins_b, draws) in tallies.items():
+        total = wins_a + wins_b + draws
+        matrix[name_a][name_b] = wins_a / total if total else None
+        matrix[name_b][name_a] = wins_b / total if total else None
+    return matrix
+
+def draw_rate_matrix(names, tallies):
+    """Builds draws[row][col] = fraction of battles between the two units that were drawn."""
+    draws = {name: {} for name in names}
+    for (name_a, name_b), (wins_a, wins_b, drawn) in tallies.items():
+        total = wins_a + wins_b + drawn
+        draws[name_a][name_b] = draws[name_b][name_a] = drawn / total if total else None
+    return draws
+
+def write_matrix(path, names, matrix, battles, seed, fingerprints, draws):
+    """Saves the matrix with each unit's fingerprint, so a later --refresh can tell what changed."""
+    with open(path, 'w') as f:
+        json.dump({'engine_version': ENGINE_VERSION, 'battles_per_pair': battles, 'seed': seed, 'units': names,
+                   'fingerprints': fingerprints, 'win_rates': matrix, 'draw_rates': draws}, f, indent=2)
+
+def print_matrix(names, matrix, draws):
+    width = max(len(name) for name in names)
+    print(" " * width + " | overall | draws")
+    for name in names:
+        rates = [rate for rate in matrix[name].values() if rate is not None]
+        overall = sum(rates) / len(rates) if rates else 0
+        drawn = [rate for rate in draws.get(name, {}).values() if rate is not None]
+        draw_rate = sum(drawn) / len(drawn) if drawn else 0
+        print(f"{name:<{width}} | {overall:7.3f} | {draw_rate:.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin tournament across the whole units roster.")
+    parser.add_argument("-n", "--battles", type=int, default=None,
+                        help="battles per pair of units (default: 100, or the saved run's count with --refresh)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_BATTLES, help="battles per task sent to a worker")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="where to write the win-rate matrix")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="master seed (default: random, saved with the results; --refresh reuses the saved one)")
+    parser.add_argument("--replay", nargs=3, metavar=("UNIT_A", "UNIT_B", "INDEX"),
+                        help="re-run one battle with full narration (seed from the cache, else --seed)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="matchup cache file")
+    parser.add_argument("--no-cache", action="store_true", help="simulate every pair from scratch")
+    parser.add_argument("--refresh", action="store_true",
+                        help="update the saved matrix in --output, replaying only pairs of added or edited units")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="with --refresh, report win rates that moved by more than this")
+    parser.add_argument("--profile", action="store_true", help="time each round phase across all workers")
+    args = parser.parse_args()
+    cache = None if args.no_cache else MatchupCache(args.cache)
+    timers = PhaseTimers() if args.profile else None
+
+    if args.replay:
+        name_a, name_b, index = args.replay
+        # Pairings are keyed in roster order, as run_tournament builds them
+        if name_b < name_a:
+            name_a, name_b = name_b, name_a
+        unit_a = unit_loader.load_unit(name_a)
+        unit_b = unit_loader.load_unit(name_b)
+        if not unit_a or not unit_b:
+            return
+        # A cached pair keeps the seed it was first played with, whatever
+        # the seed of the tournament that reused it
+        seed = args.seed
+        entry = cache.get(unit_fingerprint(unit_a), unit_fingerprint(unit_b)) if cache is not None else None
+        if entry is not None:
+            if seed is not None and seed != entry['seed']:
+                print(f"Warning: the cached results for {name_a} vs {name_b} were played with seed "
+                      f"{entry['seed']}, not {seed}; replaying with {entry['seed']}.")
+            seed = entry['seed']
+        if seed is None:
+            parser.error("--replay needs the --seed of the tournament (or a cached result for the pair)")
+        play_battle(unit_a, unit_b, seed, int(index), sink=CONSOLE)
+        return
+
+    if args.refresh:
+        refresh(args, cache, timers)
+    else:
+        seed = new_master_seed() if args.seed is None else args.seed
+        battles = args.battles or 100
+        names, tallies = run_tournament(battles, args.workers, args.chunk, seed, cache, timers)
+        matrix = win_rate_matrix(names, tallies)
+        draws = draw_rate_matrix(names, tallies)
+        fingerprints = {name: unit_fingerprint(unit_loader.load_unit(name)) for name in names}
+        write_matrix(args.output, names, matrix, battles, seed, fingerprints, draws)
+        print_matrix(names, matrix, draws)
+        print(f"\nWin-rate matrix written to '{args.output}' (seed {seed}).")
+        if cache is not None:
+            print("Pairs taken from the cache keep the seed they were first played with; --replay uses it.")
+    if cache is not None:
+        cache.close()
+    if timers is not None:
+        print("\nTime per round phase (simulated battles only):")
+        timers.report()
+
+def refresh(args, cache, timers=None):
+    try:
+        with open(args.output, 'r') as f:
+            previous = json.load(f)
+    except FileNotFoundError:
+        print(f"No saved tournament at '{args.output}'; run a full tournament first.")
+        return
+    if 'fingerprints' not in previous:
+        print("The saved tournament has no unit fingerprints; every pair will be replayed.")
+    elif previous.get('engine_version') != ENGINE_VERSION:
+        print(f"The saved tournament was played under engine version {previous.get('engine_version', 'unknown')}, "
+              f"not {ENGINE_VERSION}; every pair will be replayed.")
+    # Kept pairs were played with the saved seed and battle count, and the file
+    # records one of each, so replayed pairs must use them too
+    seed = previous.get('seed')
+    battles = previous.get('battles_per_pair')
+    for option, requested, saved in (("--seed", args.seed, seed), ("-n", args.battles, battles)):
+        if requested is not None and saved is not None and requested != saved:
+            print(f"The saved tournament used {option} {saved}; run a full tournament to change it.")
+            return
+    if seed is None:
+        seed = new_master_seed() if args.seed is None else args.seed
+    battles = battles or args.battles or 100
+    names, matrix, draws, fingerprints, (added, removed, edited), moved = refresh_tournament(
+        previous, battles, args.workers, args.chunk, seed, cache, timers)
+    for label, units in (("Added", added), ("Removed", removed), ("Edited", edited)):
+        if units:
+            print(f"{label}: {', '.join(units)}")
+    if not (added or removed or edited):
+        print("No units changed since the last run.")
+
+    shifts = [entry for entry in moved if abs(entry[3] - entry[2]) > args.threshold]
+    if shifts:
+        print(f"\nWin rates that moved by more than {args.threshold:.1%}:")
+        for name_a, name_b, old_rate, new_rate in sorted(shifts, key=lambda e: -abs(e[3] - e[2])):
+            print(f"  {name_a} vs {name_b}: {old_rate:.3f} -> {new_rate:.3f}")
+    write_matrix(args.output, names, matrix, battles, seed, fingerprints, draws)
+    print(f"\nWin-rate matrix updated in '{args.output}' (seed {seed}).")
+
+if __name__ == "__main__":
+    main()
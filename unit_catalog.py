@@ -0,0 +1,280 @@
+# unit_catalog.py
+#
+# All units packed into one file, so large rosters load without listing the
+# units folder and opening one file per unit. The catalog is append-only:
+# adding or changing a unit appends a record, and removing one appends a
+# tombstone; the newest record for a name wins. Each record keeps the unit's
+# JSON exactly as it was in units/<name>.json, plus that file's mtime and
+# size so sync() only copies files that changed.
+#
+#   catalog     file header (magic, version, units folder mtime at the last
+#               sync), then records: name length, JSON length (TOMBSTONE for
+#               a removed unit), source mtime, source size, name, JSON
+#   <path>.idx  one (record offset, name) entry per record, read at open to
+#               build the name -> offset index
+#
+# Records are read through a memory map. Appends and header updates hold an
+# exclusive lock on the catalog where fcntl is available. Handles inherited
+# across a fork share one file offset and one lock with the parent and every
+# sibling, so a forked process reopens the catalog before its first write;
+# with that, processes sharing a catalog (such as tournament workers, which
+# fork after the shared registry has opened it) can sync it safely.
+# compact() rewrites the catalog without superseded records and should run
+# while nothing else uses it.
+#
+# When units.catalog exists next to the units folder, unit_registry reads
+# units from it (see UnitRegistry); build it with:
+#   python unit_catalog.py build
+import argparse
+import json
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked
+    fcntl = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CATALOG = os.path.join(SCRIPT_DIR, "units.catalog")
+DEFAULT_UNITS_DIR = os.path.join(SCRIPT_DIR, "units")
+
+MAGIC = b"UCAT"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHq")
+RECORD_HEADER = struct.Struct("<HIqQ")
+INDEX_ENTRY = struct.Struct("<QH")
+TOMBSTONE = 0xFFFFFFFF
+
+class UnitCatalog:
+    def __init__(self, path=DEFAULT_CATALOG):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as f:
+                f.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+            open(path + ".idx", 'wb').close()
+        self.open()
+
+    def open(self):
+        """Opens the catalog's files for the calling process."""
+        self.pid = os.getpid()
+        self.file = open(self.path, 'r+b')
+        magic, version, self.units_mtime = FILE_HEADER.unpack(self.file.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} unit catalog")
+        self.data = None
+        self.offsets = self.read_index()
+        self.index = open(self.path + ".idx", 'ab')
+
+    def own_handles(self):
+        """Reopens the catalog if this process inherited its handles through a fork."""
+        if self.pid != os.getpid():
+            self.close()
+            self.open()
+
+    def lock(self):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def unlock(self):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def read_index(self):
+        """{name: record offset} for every live unit, from the .idx file."""
+        try:
+            with open(self.path + ".idx", 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return self.rebuild_index()
+        offsets = {}
+        position = 0
+        while position + INDEX_ENTRY.size <= len(raw):
+            offset, name_size = INDEX_ENTRY.unpack_from(raw, position)
+            position += INDEX_ENTRY.size
+            if position + name_size > len(raw):
+                break  # an entry cut short by an interrupted write
+            offsets[raw[position:position + name_size].decode()] = offset
+            position += name_size
+        return {name: offset for name, offset in offsets.items() if not self.is_tombstone(offset)}
+
+    def rebuild_index(self):
+        """Recreates a missing .idx file by scanning the catalog's records."""
+        offsets = {}
+        data = self.mapped()
+        with open(self.path + ".idx", 'wb') as index:
+            position = FILE_HEADER.size
+            while data is not None and position + RECORD_HEADER.size <= len(data):
+                name_size, json_size, _, _ = RECORD_HEADER.unpack_from(data, position)
+                start = position + RECORD_HEADER.size
+                name = bytes(data[start:start + name_size])
+                index.write(INDEX_ENTRY.pack(position, name_size) + name)
+                offsets[name.decode()] = position
+                position = start + name_size + (0 if json_size == TOMBSTONE else json_size)
+        return {name: offset for name, offset in offsets.items() if not self.is_tombstone(offset)}
+
+    def mapped(self):
+        """The catalog's memory map, remapped after appends; None while it has no records."""
+        if self.data is None:
+            size = os.fstat(self.file.fileno()).st_size
+            if size > FILE_HEADER.size:
+                self.data = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        return self.data
+
+    def is_tombstone(self, offset):
+        return RECORD_HEADER.unpack_from(self.mapped(), offset)[1] == TOMBSTONE
+
+    # === Reading ===
+    def names(self):
+        return list(self.offsets)
+
+    def __contains__(self, name):
+        return name in self.offsets
+
+    def offset(self, name):
+        """Offset of the unit's current record, None if it isn't in the catalog."""
+        return self.offsets.get(name)
+
+    def signature(self, name):
+        """(mtime_ns, size) of the file the unit was last synced from, or None."""
+        offset = self.offsets.get(name)
+        if offset is None:
+            return None
+        _, _, mtime, size = RECORD_HEADER.unpack_from(self.mapped(), offset)
+        return mtime, size
+
+    def read(self, name):
+        """The unit's JSON text as bytes, or None."""
+        offset = self.offsets.get(name)
+        if offset is None:
+            return None
+        data = self.mapped()
+        name_size, json_size, _, _ = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size + name_size
+        return data[start:start + json_size]
+
+    def get(self, name):
+        """The parsed unit, or None. Raises json.JSONDecodeError for a malformed unit."""
+        raw = self.read(name)
+        return None if raw is None else json.loads(raw)
+
+    # === Appending ===
+    def append(self, name, raw, signature=(0, 0)):
+        """Appends a record; raw is the unit's JSON as bytes, or None for a tombstone."""
+        encoded = name.encode()
+        json_size = TOMBSTONE if raw is None else len(raw)
+        self.own_handles()
+        self.lock()
+        try:
+            self.file.seek(0, os.SEEK_END)
+            offset = self.file.tell()
+            self.file.write(RECORD_HEADER.pack(len(encoded), json_size, *signature) + encoded + (raw or b""))
+            self.file.flush()
+            self.index.write(INDEX_ENTRY.pack(offset, len(encoded)) + encoded)
+            self.index.flush()
+        finally:
+            self.unlock()
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        if raw is None:
+            self.offsets.pop(name, None)
+        else:
+            self.offsets[name] = offset
+
+    def put(self, name, unit, signature=(0, 0)):
+        """Adds or replaces a unit given as a dict."""
+        self.append(name, json.dumps(unit, indent=2).encode(), signature)
+
+    def remove(self, name):
+        if name in self.offsets:
+            self.append(name, None)
+
+    def sync_file(self, name, path, info=None):
+        """Copies units/<name>.json into the catalog if it changed since the last sync."""
+        info = info or os.stat(path)
+        signature = (info.st_mtime_ns, info.st_size)
+        if self.signature(name) == signature:
+            return False
+        with open(path, 'rb') as f:
+            self.append(name, f.read(), signature)
+        return True
+
+    def sync(self, units_dir=DEFAULT_UNITS_DIR):
+        """Brings the catalog up to date with a units folder; returns (updated, removed)."""
+        mtime = os.stat(units_dir).st_mtime_ns
+        present = set()
+        updated = 0
+        for entry in os.scandir(units_dir):
+            if entry.name.endswith(".json") and entry.is_file():
+                name = entry.name[:-5]
+                present.add(name)
+                updated += self.sync_file(name, entry.path, entry.stat())
+        removed = [name for name in self.offsets if name not in present]
+        for name in removed:
+            self.remove(name)
+        self.set_units_mtime(mtime)
+        return updated, len(removed)
+
+    def set_units_mtime(self, mtime):
+        """Records the units folder mtime the catalog was last synced at."""
+        self.own_handles()
+        self.units_mtime = mtime
+        self.lock()
+        try:
+            self.file.seek(0)
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, mtime))
+            self.file.flush()
+        finally:
+            self.unlock()
+
+    def compact(self):
+        """Rewrites the catalog with only the current record of each unit."""
+        for path in (self.path + ".tmp", self.path + ".tmp.idx"):
+            if os.path.exists(path):
+                os.remove(path)
+        temp = UnitCatalog(self.path + ".tmp")
+        for name in self.offsets:
+            temp.append(name, bytes(self.read(name)), self.signature(name))
+        temp.set_units_mtime(self.units_mtime)
+        temp.close()
+        self.close()
+        os.replace(self.path + ".tmp.idx", self.path + ".idx")
+        os.replace(self.path + ".tmp", self.path)
+        self.__init__(self.path)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+        self.index.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the units folder into a single catalog file.")
+    parser.add_argument("command", choices=["build", "sync", "list", "compact"],
+                        help="build a fresh catalog, sync changes, list its units, or drop superseded records")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="catalog file")
+    parser.add_argument("--units", default=DEFAULT_UNITS_DIR, help="units folder to pack")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for path in (args.catalog, args.catalog + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+    catalog = UnitCatalog(args.catalog)
+    if args.command in ("build", "sync"):
+        updated, removed = catalog.sync(args.units)
+        print(f"{len(catalog.names())} units in {args.catalog} ({updated} updated, {removed} removed).")
+    elif args.command == "list":
+        for name in sorted(catalog.names()):
+            print(name)
+    else:
+        before = os.path.getsize(args.catalog)
+        catalog.compact()
+        print(f"{args.catalog}: {before:,} -> {os.path.getsize(args.catalog):,} bytes.")
+    catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,29 @@
-import json
-import os
+import warnings
 
-# Automatically determine the path to the "units" folder
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-UNITS_DIR = os.path.join(SCRIPT_DIR, "units")
+from abilities import unknown_abilities
+from unit_registry import REGISTRY
+
+class UnknownAbilityWarning(UserWarning):
+    """A unit lists a spell_ or skill_ tag that spells.json or skills.json doesn't define."""
+
+# Units already warned about, so repeated loads don't repeat the warning
+_warned_units = set()
 
 def list_unit_files():
     """Returns a list of available unit file names (without .json extension)."""
-    return [f.replace(".json", "") for f in os.listdir(UNITS_DIR) if f.endswith(".json")]
+    return REGISTRY.names()
 
 def load_unit(unit_name):
-    """Loads a unit JSON file by name and returns the parsed data."""
-    path = os.path.join(UNITS_DIR, f"{unit_name}.json")
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"Error: Unit file not found: {path}")
-        return None
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON format in {path}")
+    """Returns the unit by name as a read-only view from the shared registry."""
+    unit = REGISTRY.get(unit_name)
+    if unit is None:
         return None
+    if unit_name not in _warned_units:
+        _warned_units.add(unit_name)
+        for tag in unknown_abilities(unit):
+            warnings.warn(f"{unit_name} references unknown ability '{tag}'; it will be ignored.",
+                          UnknownAbilityWarning, stacklevel=2)
+    return unit
 
 def get_unit_by_name(unit_name):
     """Alias for load_unit for compatibility with legacy code."""
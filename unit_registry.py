@@ -0,0 +1,134 @@
+# unit_registry.py
+#
+# One in-memory copy of every unit file, shared by all loaders. Each file is
+# read and parsed once; later lookups only stat it and reuse the parsed unit
+# while its mtime and size are unchanged. Units are handed out as read-only
+# views (mappings become MappingProxyType, lists become tuples) so no caller
+# can corrupt the shared copy. Use thaw() for a private, editable copy.
+#
+# If a packed catalog (see unit_catalog.py) exists, units are read from it
+# instead of one file each. The catalog is kept in step with the folder: it
+# is re-synced when the folder's mtime differs from the one it was synced
+# at (a unit was added, removed or renamed), and a unit whose file has
+# changed in place is re-copied when it is next looked up. Without a units
+# folder the catalog is the whole roster.
+import json
+import os
+from types import MappingProxyType
+
+from unit_catalog import DEFAULT_CATALOG, UnitCatalog
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+UNITS_DIR = os.path.join(SCRIPT_DIR, "units")
+
+def freeze(value):
+    """Returns a read-only view of parsed JSON data."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Returns a plain, mutable copy of a frozen unit (dicts and lists)."""
+    if isinstance(value, MappingProxyType) or isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [thaw(item) for item in value]
+    return value
+
+class UnitRegistry:
+    def __init__(self, units_dir=UNITS_DIR, catalog_path=DEFAULT_CATALOG):
+        self.units_dir = units_dir
+        self._units = {}         # name -> ((mtime_ns, size) or catalog offset, frozen unit)
+        self._listing = None     # (directory mtime_ns, [names])
+        self.catalog = None
+        if catalog_path and os.path.exists(catalog_path):
+            self.catalog = UnitCatalog(catalog_path)
+
+    def names(self):
+        """Unit names in the folder, re-listed only when the folder itself changes."""
+        if self.catalog is not None:
+            return self._catalog_names()
+        mtime = os.stat(self.units_dir).st_mtime_ns
+        if self._listing is None or self._listing[0] != mtime:
+            names = [f[:-5] for f in os.listdir(self.units_dir) if f.endswith(".json")]
+            self._listing = (mtime, names)
+        return list(self._listing[1])
+
+    def get(self, unit_name):
+        """Returns the read-only unit, or None (with a message) if it can't be loaded."""
+        if self.catalog is not None:
+            return self._catalog_get(unit_name)
+        path = os.path.join(self.units_dir, f"{unit_name}.json")
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            self._units.pop(unit_name, None)
+            print(f"Error: Unit file not found: {path}")
+            return None
+        signature = (info.st_mtime_ns, info.st_size)
+        cached = self._units.get(unit_name)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        try:
+            with open(path, 'r') as f:
+                unit = freeze(json.load(f))
+        except json.JSONDecodeError:
+            print(f"Error: Invalid JSON format in {path}")
+            return None
+        self._units[unit_name] = (signature, unit)
+        return unit
+
+    def _catalog_names(self):
+        try:
+            mtime = os.stat(self.units_dir).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime != self.catalog.units_mtime:
+            self.catalog.sync(self.units_dir)
+        return self.catalog.names()
+
+    def _catalog_get(self, unit_name):
+        catalog = self.catalog
+        if os.path.isdir(self.units_dir):
+            path = os.path.join(self.units_dir, f"{unit_name}.json")
+            try:
+                catalog.sync_file(unit_name, path)
+            except FileNotFoundError:
+                catalog.remove(unit_name)
+        offset = catalog.offset(unit_name)
+        if offset is None:
+            self._units.pop(unit_name, None)
+            print(f"Error: Unit not found in catalog: {unit_name}")
+            return None
+        cached = self._units.get(unit_name)
+        if cached and cached[0] == offset:
+            return cached[1]
+
+        try:
+            unit = freeze(catalog.get(unit_name))
+        except json.JSONDecodeError:
+            print(f"Error: Invalid JSON format for {unit_name} in {catalog.path}")
+            return None
+        self._units[unit_name] = (offset, unit)
+        return unit
+
+    def all(self):
+        """Every loadable unit as {name: unit}."""
+        units = {}
+        for name in self.names():
+            unit = self.get(name)
+            if unit:
+                units[name] = unit
+        return units
+
+# Shared registry for the default units folder
+REGISTRY = UnitRegistry()
+
+def get_unit(unit_name):
+    return REGISTRY.get(unit_name)
+
+def list_units():
+    return REGISTRY.names()
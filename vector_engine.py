@@ -0,0 +1,253 @@
+# vector_engine.py
+#
+# Runs many copies of the same duel at once. Every per-battle quantity (HP,
+# mana, stamina, cooldowns, effect timers) is an array over the batch, so a
+# round is a handful of array operations instead of thousands of dict updates.
+# The rules mirror combat_loop.run_battle step for step.
+import argparse
+import numpy as np
+
+import unit_loader
+from abilities import compile_abilities
+from combat_loop import MAX_ROUNDS, STALEMATE_WINDOW
+from resistances import resistance_table, resisted
+
+STATS = ("str", "dex", "con", "int", "wis")
+STR, DEX, CON, INT, WIS = range(len(STATS))
+
+class Side:
+    """Rule data for one unit plus its state arrays across the whole batch."""
+
+    def __init__(self, unit, opponent, batch):
+        self.unit = unit
+        stats = unit.get("stats", {})
+        self.base = np.array([stats.get(stat, 10) for stat in STATS], dtype=np.int64)
+        # Spells and skills in the order choose_resolved_action tries them
+        self.spells = []
+        self.skills = []
+        effect_rows = []
+        for ability in compile_abilities(unit):
+            lo, hi = ability.magnitude
+            if ability.kind == "spell":
+                damage = None
+                if ability.effect == "damage":
+                    # Lookup table of resisted damage for every possible roll
+                    table = resistance_table(opponent)
+                    damage = np.array([resisted(table, amount, ability.channel_index) for amount in range(lo, hi + 1)],
+                                      dtype=np.int64)
+                self.spells.append((ability.cost, ability.cooldown, lo, hi, damage))
+                continue
+            slot = None
+            if ability.effect in ("buff", "debuff"):
+                slot = len(effect_rows)
+                row = np.zeros(len(STATS), dtype=np.int64)
+                if ability.stat in STATS:
+                    row[STATS.index(ability.stat)] = ability.modifier
+                # An effect lasting one turn or less expires before it is ever read
+                effect_rows.append((row, max(1, ability.duration or 0)))
+            self.skills.append((ability.cost, ability.cooldown, ability.effect, ability.magnitude, slot))
+
+        # timers[b, k, d] counts instances of effect k with d turns left in battle b
+        max_duration = max((duration for _, duration in effect_rows), default=0)
+        self.effect_mods = np.array([row for row, _ in effect_rows], dtype=np.int64).reshape(-1, len(STATS))
+        self.effect_durations = [duration for _, duration in effect_rows]
+        self.timers = np.zeros((batch, len(effect_rows), max_duration + 1), dtype=np.int64)
+
+        derived = derive(self.base[np.newaxis, :])
+        # Defenders are always re-derived without effects before being hit
+        self.ac = int(derived['ac'][0])
+        self.hp = np.full(batch, derived['hp_total'][0], dtype=np.int64)
+        self.mana = np.full(batch, derived['mana_total'][0], dtype=np.int64)
+        self.stamina = np.full(batch, derived['stamina_total'][0], dtype=np.int64)
+        self.spell_cooldown = np.zeros(batch, dtype=np.int64)
+        self.skill_cooldown = np.zeros(batch, dtype=np.int64)
+        self.actions = {'attack': np.zeros(batch, dtype=np.int64),
+                        'cast': np.zeros(batch, dtype=np.int64),
+                        'skill': np.zeros(batch, dtype=np.int64)}
+
+    def has_effects(self, idx):
+        """Whether each battle in idx has any effect active on this side."""
+        if not self.effect_durations:
+            return np.zeros(len(idx), dtype=bool)
+        return self.timers[idx].any(axis=(1, 2))
+
+    def effective_stats(self, idx):
+        """Base stats plus every active effect modifier, one row per battle in idx."""
+        if not self.effect_durations:
+            return np.broadcast_to(self.base, (len(idx), len(STATS)))
+        active = self.timers[idx].sum(axis=2)
+        return self.base + active @ self.effect_mods
+
+def derive(stats):
+    """Vectorized derived_stats.calculate_derived_stats over rows of (str, dex, con, int, wis)."""
+    mind = stats[:, INT] + stats[:, WIS]
+    return {
+        'hitroll': stats[:, DEX] // 2,
+        'damroll': stats[:, STR] // 3,
+        'ac': 10 + stats[:, DEX] // 4,
+        'hp_total': stats[:, CON] * 5,
+        'mana_total': mind * 5,
+        'stamina_total': (stats[:, STR] + stats[:, DEX] + stats[:, CON]) * 3,
+        'hp_regen': stats[:, CON] // 8,
+        'mana_regen': mind // 8,
+        'stamina_regen': (stats[:, STR] + stats[:, CON]) // 8,
+    }
+
+def act(actor, target, idx, rng):
+    """Resolves one action for every battle in idx, like combat_core.resolve_action."""
+    stats = actor.effective_stats(idx)
+    hitroll = stats[:, DEX] // 2
+    damroll = stats[:, STR] // 3
+    pending = np.ones(len(idx), dtype=bool)
+
+    if actor.spells:
+        ready = actor.spell_cooldown[idx] <= 0
+        for cost, cooldown, lo, hi, damage in actor.spells:
+            chosen = pending & ready & (actor.mana[idx] >= cost)
+            if not chosen.any():
+                continue
+            pending &= ~chosen
+            battles = idx[chosen]
+            actor.mana[battles] -= cost
+            rolls = rng.integers(lo, hi + 1, size=len(battles))
+            if damage is not None:
+                target.hp[battles] -= damage[rolls - lo]
+            actor.spell_cooldown[battles] = cooldown
+            actor.actions['cast'][battles] += 1
+
+    if actor.skills:
+        ready = actor.skill_cooldown[idx] <= 0
+        for cost, cooldown, effect, magnitude, slot in actor.skills:
+            chosen = pending & ready & (actor.stamina[idx] >= cost)
+            if not chosen.any():
+                continue
+            pending &= ~chosen
+            battles = idx[chosen]
+            actor.stamina[battles] -= cost
+            if slot is not None:
+                actor.timers[battles, slot, actor.effect_durations[slot]] += 1
+            elif effect == "damage":
+                target.hp[battles] -= rng.integers(magnitude[0], magnitude[1] + 1, size=len(battles))
+            actor.skill_cooldown[battles] = cooldown
+            actor.actions['skill'][battles] += 1
+
+    if pending.any():
+        battles = idx[pending]
+        hits = rng.integers(1, 21, size=len(battles)) + hitroll[pending] >= target.ac
+        damage = rng.integers(1, 5, size=len(battles)) + damroll[pending]
+        target.hp[battles[hits]] -= damage[hits]
+        actor.actions['attack'][battles] += 1
+
+def end_of_round(side, idx):
+    """Effect ticks, stat recalculation, regen and cooldown ticks for every battle in idx."""
+    if side.effect_durations:
+        timers = side.timers[idx]
+        timers[:, :, :-1] = timers[:, :, 1:]
+        timers[:, :, -1] = 0
+        timers[:, :, 0] = 0
+        side.timers[idx] = timers
+    derived = derive(side.effective_stats(idx))
+    side.hp[idx] = np.minimum(derived['hp_total'], side.hp[idx] + derived['hp_regen'])
+    side.mana[idx] = np.minimum(derived['mana_total'], side.mana[idx] + derived['mana_regen'])
+    side.stamina[idx] = np.minimum(derived['stamina_total'], side.stamina[idx] + derived['stamina_regen'])
+    side.spell_cooldown[idx] -= side.spell_cooldown[idx] > 0
+    side.skill_cooldown[idx] -= side.skill_cooldown[idx] > 0
+
+def simulate(unit1_data, unit2_data, battles, seed=None, max_rounds=MAX_ROUNDS, stalemate_window=STALEMATE_WINDOW):
+    """Runs `battles` independent copies of unit1 vs unit2 and returns per-battle arrays.
+
+    The result holds 'side' (1 or 2 for the winner, 0 for a draw),
+    'rounds', final 'hp'/'mana'/'stamina' and per-action counts for each
+    unit. Draws follow run_battle: the round cap, or stalemate_window
+    unchanged rounds with no effects active.
+    """
+    rng = np.random.default_rng(seed)
+    side1 = Side(unit1_data, unit2_data, battles)
+    side2 = Side(unit2_data, unit1_data, battles)
+    winner = np.zeros(battles, dtype=np.int64)
+    rounds = np.zeros(battles, dtype=np.int64)
+    active = np.arange(battles)
+    # HP and pools of both sides at the end of the last round; -1 never matches
+    last_pools = np.full((battles, 6), -1, dtype=np.int64)
+    unchanged = np.zeros(battles, dtype=np.int64)
+    round_number = 1
+
+    while len(active):
+        act(side1, side2, active, rng)
+        done = side2.hp[active] <= 0
+        winner[active[done]] = 1
+        rounds[active[done]] = round_number
+        active = active[~done]
+
+        act(side2, side1, active, rng)
+        done = side1.hp[active] <= 0
+        winner[active[done]] = 2
+        rounds[active[done]] = round_number
+        active = active[~done]
+
+        end_of_round(side1, active)
+        end_of_round(side2, active)
+
+        pools = np.stack([side1.hp[active], side1.mana[active], side1.stamina[active],
+                          side2.hp[active], side2.mana[active], side2.stamina[active]], axis=1)
+        effects = side1.has_effects(active) | side2.has_effects(active)
+        same = (pools == last_pools[active]).all(axis=1) & ~effects
+        unchanged[active] = np.where(same, unchanged[active] + 1, 0)
+        last_pools[active] = np.where(effects[:, np.newaxis], -1, pools)
+        done = unchanged[active] >= stalemate_window
+        if round_number >= max_rounds:
+            done[:] = True
+        rounds[active[done]] = round_number
+        active = active[~done]
+        round_number += 1
+
+    return {
+        'side': winner,
+        'rounds': rounds,
+        'unit1': side_arrays(side1),
+        'unit2': side_arrays(side2),
+    }
+
+def side_arrays(side):
+    return {
+        'name': side.unit['name'],
+        'hp': side.hp,
+        'mana': side.mana,
+        'stamina': side.stamina,
+        'actions': side.actions,
+    }
+
+def summarize(result):
+    """Win rates and battle length statistics for a simulate() result."""
+    battles = len(result['side'])
+    return {
+        'battles': battles,
+        'unit1_win_rate': float(np.mean(result['side'] == 1)) if battles else 0.0,
+        'unit2_win_rate': float(np.mean(result['side'] == 2)) if battles else 0.0,
+        'draw_rate': float(np.mean(result['side'] == 0)) if battles else 0.0,
+        'mean_rounds': float(np.mean(result['rounds'])) if battles else 0.0,
+        'rounds_histogram': np.bincount(result['rounds']).tolist(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate thousands of copies of one matchup at once.")
+    parser.add_argument("unit1")
+    parser.add_argument("unit2")
+    parser.add_argument("-n", "--battles", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    unit1 = unit_loader.load_unit(args.unit1)
+    unit2 = unit_loader.load_unit(args.unit2)
+    if not unit1 or not unit2:
+        return
+    summary = summarize(simulate(unit1, unit2, args.battles, args.seed))
+    print(f"{unit1['name']} vs {unit2['name']} over {summary['battles']} battles")
+    print(f"  {unit1['name']} wins: {summary['unit1_win_rate']:.2%}")
+    print(f"  {unit2['name']} wins: {summary['unit2_win_rate']:.2%}")
+    if summary['draw_rate']:
+        print(f"  Draws: {summary['draw_rate']:.2%}")
+    print(f"  Average length: {summary['mean_rounds']:.2f} rounds")
+
+if __name__ == "__main__":
+    main()
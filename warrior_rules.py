@@ -3,26 +3,38 @@ import os
 import random
 
 SKILLS_FILE = os.path.join(os.path.dirname(__file__), "skills.json")
-with open(SKILLS_FILE, "r") as f:
-    SKILL_DATA = json.load(f)
+
+def skill_data():
+    """skills.json, parsed on first use rather than at import."""
+    global SKILL_DATA
+    try:
+        return SKILL_DATA
+    except NameError:
+        with open(SKILLS_FILE, "r") as f:
+            SKILL_DATA = json.load(f)
+        return SKILL_DATA
+
+def __getattr__(name):
+    # Keeps `warrior_rules.SKILL_DATA` working before anything has loaded it
+    if name == "SKILL_DATA":
+        return skill_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_skill_cost(unit_data, skill_name):
-    return SKILL_DATA.get(skill_name, {}).get("cost", None)
+    return skill_data().get(skill_name, {}).get("cost", None)
 
 def get_skill_cooldown(skill_name):
-    return SKILL_DATA.get(skill_name, {}).get("cooldown", 0)
+    return skill_data().get(skill_name, {}).get("cooldown", 0)
 
-def use_skill(user, target, skill_name):
-    skill = SKILL_DATA.get(skill_name)
+def use_skill(user, target, skill_name, rng=random):
+    skill = skill_data().get(skill_name)
     if not skill:
-        print(f"Unknown skill: {skill_name}")
         return None
 
     effect_type = skill.get("effect")
 
     if effect_type == "damage":
-        amount = random.randint(*skill["magnitude"])
-        print(f"{user['name']} uses {skill_name} on {target['name']} for {amount} damage!")
+        amount = rng.randint(*skill["magnitude"])
         return amount
 
     elif effect_type in ["buff", "debuff"]:
@@ -33,24 +45,17 @@ def use_skill(user, target, skill_name):
             "source": user['name']
         }
 
-        if effect_type == "buff":
-            print(f"{user['name']} uses {skill_name} and gains +{skill['modifier']} {skill['stat']} for {skill['duration']} turns.")
-        else:
-            print(f"{user['name']} uses {skill_name} on {target['name']} reducing their {skill['stat']} by {abs(skill['modifier'])} for {skill['duration']} turns.")
-
         return {"effect": effect}
 
     else:
-        print(f"{skill_name} has no recognized effect type.")
         return None
 
-def choose_skill(user, target, stamina, available, cooldowns):
-    usable = [
-        s for s in available
-        if get_skill_cost(user, s) is not None
-        and get_skill_cost(user, s) <= stamina
-        and cooldowns.get(s, 0) <= 0
-    ]
+def choose_skill(user, target, stamina, available, cooldowns, rng=random):
+    usable = []
+    for s in available:
+        cost = get_skill_cost(user, s)
+        if cost is not None and cost <= stamina and cooldowns.get(s, 0) <= 0:
+            usable.append(s)
     if usable:
-        return random.choice(usable)
+        return rng.choice(usable)
     return None
\ No newline at end of file